@@ -1,16 +1,35 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, Response, g, render_template, request, jsonify, send_file, stream_with_context
 import pandas as pd
+import numpy as np
 import os
-import re
+import json
+import gzip
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 import io
 import tempfile
+import threading
 from datetime import datetime
+import time
 import requests
+from snapshot_cache import (load_snapshot, find_snapshot, save_snapshot, conditional_headers,
+                            download_to_file, response_validators, snapshot_lock)
+from dataset import Dataset, build_dataset, apply_delta, publish_dataset, latest_version
+from changelog import append_changes, changes_for_cas, release_summaries
+from cas_codec import normalize_cas_number, encode_cas, is_valid_cas
+from flags import FLAG_DEFINITIONS, FLAG_BITS
+from jobs import JobManager, annotated_rows, screened_rows, iter_input_values, iter_batches
+from export import csv_chunks, write_xlsx, xlsx_available, XLSX_MIMETYPE
+from reloader import Reloader
+from warmup import Warmup
+import metrics
+from metrics import Counter, Gauge, Histogram, SIZE_BUCKETS, COUNT_BUCKETS
 
 # Import configuration
 try:
-    from config import GOOGLE_DRIVE_CONFIG, LOCAL_FILES
+    from config import (GOOGLE_DRIVE_CONFIG, LOCAL_FILES, SOURCES_CONFIG, SNAPSHOT_CONFIG, SHARED_DATA_CONFIG,
+                        JOB_CONFIG, DELTA_CONFIG, SEARCH_CACHE_CONFIG, STARTUP_CONFIG)
 except ImportError:
     # Fallback configuration if config.py doesn't exist
     GOOGLE_DRIVE_CONFIG = {
@@ -37,234 +56,569 @@ except ImportError:
         'tscainv': 'TSCAINV_012025.csv',
         'pmnacc': 'PMNACC_012025.csv'
     }
+    SOURCES_CONFIG = {
+        'pmnacc': {
+            'source': 'PMNACC',
+            'enabled': True,
+            'header': 'ID,PMNNO,ACCNO',
+            'cas_columns': ['ACCNO'],
+            'display_cas_columns': ['ACCNO'],
+            'name_column': 'GenericName',
+            'flag_column': 'FLAG',
+            'activity_column': 'ACTIVITY',
+            'id_column': 'ID',
+            'check_digit': False
+        },
+        'tscainv': {
+            'source': 'TSCAINV',
+            'enabled': True,
+            'header': 'ID,CASRN,casregno',
+            'cas_columns': ['casregno', 'CASRN'],
+            'display_cas_columns': ['CASRN', 'casregno'],
+            'name_column': 'ChemName',
+            'flag_column': 'FLAG',
+            'activity_column': 'ACTIVITY',
+            'id_column': 'ID'
+        }
+    }
+    SNAPSHOT_CONFIG = {
+        'enabled': True,
+        'directory': 'data_cache',
+        'max_age_hours': 24
+    }
+    SHARED_DATA_CONFIG = {
+        'enabled': False,
+        'directory': 'data_cache/shared',
+        'poll_seconds': 5
+    }
+    JOB_CONFIG = {
+        'directory': 'data_cache/jobs',
+        'workers': 2,
+        'batch_size': 5000,
+        'retention_hours': 24
+    }
+    DELTA_CONFIG = {
+        'enabled': True,
+        'changelog': 'data_cache/changelog.ndjson'
+    }
+    SEARCH_CACHE_CONFIG = {
+        'size': 4096,
+        'max_age_seconds': 300
+    }
+    STARTUP_CONFIG = {
+        'background': True,
+        'retry_seconds': 30
+    }
+
+class CasRequest(Request):
+    """Request class that lifts the upload size limit for streaming endpoints"""
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint in STREAMING_ENDPOINTS:
+            return app.config['STREAM_MAX_CONTENT_LENGTH']
+        return super().max_content_length
 
 app = Flask(__name__)
+app.request_class = CasRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Streamed uploads are read in chunks, so they can be much larger
+app.config['STREAM_MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024  # 1GB max streamed file size
+
+# Endpoints that read uploads incrementally instead of all at once
+STREAMING_ENDPOINTS = {'upload_file_stream', 'submit_job', 'export_results'}
+
+# Endpoints that need the loaded data: until it is ready they answer 503 at once
+DATASET_ENDPOINTS = {'search', 'search_batch', 'search_prefix', 'query_database', 'search_names',
+                     'autocomplete_names', 'upload_file', 'upload_file_stream', 'submit_job', 'export_results',
+                     'update_database'}
+
+# Seconds clients are asked to wait before retrying while the data loads
+WARMUP_RETRY_AFTER = 5
+
+# How often a worker checks whether another worker completed a database update
+RELOAD_POLL_SECONDS = 5
 
-# Global variables to store the loaded data
-pmnacc_data = None
-tscainv_data = None
+# Number of CAS numbers resolved together when streaming upload results
+STREAM_BATCH_SIZE = 5000
+
+# Paging of /api/query and /api/names/search results
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Name autocomplete: shortest query worth answering, and suggestion counts
+MIN_AUTOCOMPLETE_LENGTH = 2
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+# Batch search: most CAS numbers per request, and fields of each match in the columnar format
+MAX_BATCH_SIZE = 10000
+BATCH_RESULT_FIELDS = ['source', 'casNumber', 'chemicalName', 'flag', 'activity']
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+# Columnar copy of the loaded databases with the CAS lookup index, see dataset.py
+dataset = None
+
+# When this worker last looked for a dataset published by another worker (shared mode)
+last_shared_check = 0.0
+
+# Outside shared mode: when this worker last looked for a reload completed by another
+# worker, and the finish time of the last one it followed
+last_reload_check = 0.0
+followed_reload = None
+follow_reload_lock = threading.Lock()
 
 # Use configuration from config.py
 GOOGLE_DRIVE_FILES = GOOGLE_DRIVE_CONFIG
 
-# Flag definitions for TSCA database
-FLAG_DEFINITIONS = {
-    '5E': 'Indicates a substance that is the subject of a TSCA section 5(e) order.',
-    '5F': 'Indicates a substance that is the subject of a TSCA section 5(f) rule.',
-    '12C': 'Indicates a substance that is prohibited to be exported from the United States under TSCA section 12(c).',
-    'FRI': 'Indicates a polymeric substance containing no free-radical initiator in its Inventory name but is considered to cover the designated polymer made with any free-radical initiator regardless of the amount used.',
-    'PE1': 'Indicates a polymer that has a number-average molecular weight of greater than or equal to 1,000 daltons and less than 10,000 daltons and that is exempt under the 1995 polymer exemption rule. The polymer\'s oligomer content must be less than 10 percent by weight below 500 daltons and less than 25 percent by weight below 1,000 daltons.',
-    'PE2': 'Indicates a polymer that has a number-average molecular weight of greater than or equal to 10,000 daltons and that is exempt under the 1995 polymer exemption rule. The polymer\'s oligomer content must be less than 2 percent by weight below 500 daltons and less than 5 percent by weight below 1,000 daltons.',
-    'PE3': 'Indicates a polymer that is a polyester and that is exempt under the 1995 polymer exemption rule. The polyester is made only from monomers and reactants included in a specified list that comprises one of the eligibility criteria for the 1995 polymer exemption rule.',
-    'PMN': 'Indicates a commenced PMN substance.',
-    'R': 'Indicates a substance that is the subject of a proposed or final TSCA section 6 risk management rule.',
-    'S': 'Indicates a substance that is identified in a final Significant New Use Rule.',
-    'SP': 'Indicates a substance that is identified in a proposed Significant New Use Rule.',
-    'T': 'Indicates a substance that is the subject of a final TSCA section 4 test rule or order.',
-    'TP': 'Indicates a substance that is the subject of a proposed TSCA section 4 test rule or order.',
-    'XU': 'Indicates a substance exempt from reporting under the Chemical Data Reporting Rule, (40 CFR 711).',
-    'Y1': 'Indicates a polymer that has a number-average molecular weight greater than 1,000 and that was exempt under the 1984 polymer exemption rule.',
-    'Y2': 'Indicates a polymer that is a polyester and that was exempt under the 1984 polymer exemption rule. The polyester is made only from reactants included in a specified list of low-concern reactants that comprises one of the eligibility criteria for the 1984 polymer exemption rule.'
-}
-
-def get_flag_description(flag):
-    """Get description for a flag or list of flags"""
-    if pd.isna(flag) or not flag:
-        return "No flag information available"
-    
-    # Split flags if multiple (e.g., "PMN; S; 5E")
-    flags = [f.strip() for f in str(flag).split(';')]
-    
-    descriptions = []
-    for f in flags:
-        if f in FLAG_DEFINITIONS:
-            descriptions.append(f"{f}: {FLAG_DEFINITIONS[f]}")
-        else:
-            descriptions.append(f"{f}: Flag description not available")
+# Prometheus metrics, served at /metrics (see metrics.py)
+REQUEST_LATENCY = Histogram('cas_http_request_duration_seconds', 'Request latency by route', ['route', 'method'])
+REQUEST_COUNT = Counter('cas_http_requests_total', 'Requests by route, method and status code',
+                        ['route', 'method', 'status'])
+UPLOAD_BYTES = Histogram('cas_upload_bytes', 'Size of uploaded files', ['endpoint'], SIZE_BUCKETS)
+UPLOAD_CAS_NUMBERS = Histogram('cas_upload_cas_numbers', 'Distinct CAS numbers per uploaded file', ['endpoint'],
+                               COUNT_BUCKETS)
+LOAD_STAGE_SECONDS = Gauge('cas_data_load_stage_seconds', 'Duration of each stage of the last data load',
+                           ['source', 'stage'])
+LOADS = Counter('cas_data_loads_total', 'Data loads and reloads by result', ['result'])
+SEARCH_CACHE = Gauge('cas_search_cache', 'Search result cache statistics since the last reload', ['stat'])
+DATASET_INFO = Gauge('cas_dataset_info', 'Version of the loaded dataset', ['version'])
+DATASET_RECORDS = Gauge('cas_dataset_records', 'Records per database in the loaded dataset', ['source'])
+
+# Enabled databases by config key, and their columns by source name (see SOURCES_CONFIG)
+SOURCES = {key: spec for key, spec in SOURCES_CONFIG.items() if spec.get('enabled', True)}
+SOURCE_COLUMNS = {spec['source']: spec for spec in SOURCES.values()}
+
+def drive_file_id(key):
+    """Google Drive file ID of a database, None if it isn't downloaded from Drive"""
+    drive_info = GOOGLE_DRIVE_FILES.get(key, {})
+    file_id = drive_info.get('file_id')
+    if not drive_info.get('enabled', True) or not file_id or file_id.startswith('YOUR_'):
+        return None
+    return file_id
+
+def database_name(key):
+    """Display name of a database, from its Google Drive entry or else its source name"""
+    return GOOGLE_DRIVE_FILES.get(key, {}).get('name', f"{SOURCES_CONFIG[key]['source']} Database")
+
+def load_source(key, spec, refresh=False):
+    """Load one database as a DataFrame, from Google Drive or else from its local file
     
-    return "; ".join(descriptions)
+    Runs on a loader thread, one per database. Returns None if the database has
+    neither a Google Drive file ID nor a local file, raises if loading fails.
+    """
+    name = spec['source']
+    file_id = drive_file_id(key)
+    if file_id is None:
+        local_path = LOCAL_FILES.get(key)
+        if not local_path or not os.path.exists(local_path):
+            print(f"No Google Drive file ID or local file configured for {name}")
+            return None
+        parse_start = time.time()
+        data = pd.read_csv(local_path)
+        LOAD_STAGE_SECONDS.set(time.time() - parse_start, source=name, stage='parse')
+        print(f"✓ Loaded {name} from local file {local_path}: {len(data)} records")
+        return data
+    
+    snapshot_dir = SNAPSHOT_CONFIG['directory']
+    use_snapshots = SNAPSHOT_CONFIG.get('enabled', True)
+    
+    # A fresh local snapshot avoids both the download and the CSV parse
+    if use_snapshots and not refresh:
+        snapshot_start = time.time()
+        data = load_snapshot(snapshot_dir, key, file_id, SNAPSHOT_CONFIG.get('max_age_hours'))
+        if data is not None:
+            LOAD_STAGE_SECONDS.set(time.time() - snapshot_start, source=name, stage='snapshot')
+            print(f"✓ Loaded {name} from local snapshot: {len(data)} records in {time.time() - snapshot_start:.2f}s")
+            return data
+    
+    # One download per source at a time, across workers and threads. A loader that
+    # waited for another one finds the snapshot it saved instead of downloading again.
+    with snapshot_lock(snapshot_dir, key, file_id):
+        if use_snapshots and not refresh:
+            data = load_snapshot(snapshot_dir, key, file_id, SNAPSHOT_CONFIG.get('max_age_hours'))
+            if data is not None:
+                print(f"✓ Loaded {name} from the local snapshot saved by another loader: {len(data)} records")
+                return data
+        return download_source(key, spec, file_id)
 
-def load_data():
-    """Load CSV data files from Google Drive"""
-    global pmnacc_data, tscainv_data
+def download_source(key, spec, file_id):
+    """Download one database from Google Drive and parse it, called with its snapshot lock held"""
+    name = spec['source']
+    snapshot_dir = SNAPSHOT_CONFIG['directory']
+    use_snapshots = SNAPSHOT_CONFIG.get('enabled', True)
+    
+    print(f"Loading {name} from Google Drive: {file_id}")
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    
+    # Try the direct download URL. With a snapshot on disk the request is
+    # conditional, so an unchanged file is answered with 304 and not transferred.
+    download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+    if use_snapshots:
+        headers.update(conditional_headers(snapshot_dir, key, file_id))
     
+    # Every download gets its own file, so concurrent loaders never share one
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fd, download_path = tempfile.mkstemp(dir=snapshot_dir, prefix=f"{key}_{file_id}_", suffix='.download')
+    os.close(fd)
     try:
-        print("Starting data load from Google Drive...")
-        
-        # Load TSCAINV from Google Drive
-        tscainv_file_id = GOOGLE_DRIVE_FILES.get('tscainv', {}).get('file_id')
-        if tscainv_file_id and tscainv_file_id != 'YOUR_TSCAINV_FILE_ID_HERE':
-            print(f"Loading TSCAINV from Google Drive: {tscainv_file_id}")
+        download_start = time.time()
+        with requests.get(download_url, headers=headers, stream=True, timeout=120) as response:
+            print(f"{name} response status: {response.status_code}")
+            
+            if response.status_code == 304:
+                data = find_snapshot(snapshot_dir, key, file_id)
+                if data is None:
+                    raise Exception("File not modified but the local snapshot is gone")
+                print(f"✓ Google Drive file not modified, loaded {name} from local snapshot: {len(data)} records")
+                return data
             
-            # Use direct file access URL - this bypasses Google Drive's download restrictions
-            tscainv_url = f"https://drive.google.com/file/d/{tscainv_file_id}/view?usp=sharing"
+            if response.status_code != 200:
+                print(f"✗ Failed to get valid response for {name}. Status: {response.status_code}")
+                raise Exception(f"HTTP {response.status_code}")
             
+            # Stream the body to disk instead of holding it in memory
+            file_hash, file_size = download_to_file(response, download_path)
+            LOAD_STAGE_SECONDS.set(time.time() - download_start, source=name, stage='download')
+            print(f"{name} content length: {file_size}")
+            if file_size <= 1000:
+                print(f"✗ Failed to get valid response for {name}. Status: {response.status_code}, Length: {file_size}")
+                raise Exception(f"HTTP {response.status_code}")
+            expected_size = response.headers.get('Content-Length')
+            if expected_size and not response.headers.get('Content-Encoding') and int(expected_size) != file_size:
+                raise Exception(f"Incomplete download of {name}: {file_size} of {expected_size} bytes")
+            
+            # Unchanged content can reuse the parsed snapshot
+            validators = response_validators(response.headers)
+            if use_snapshots:
+                data = find_snapshot(snapshot_dir, key, file_id, file_hash, validators)
+                if data is not None:
+                    print(f"✓ Google Drive file unchanged, loaded {name} from local snapshot: {len(data)} records")
+                    return data
+        
+        # Check if we got actual CSV data, the header line is enough
+        with open(download_path, encoding='utf-8', errors='replace') as f:
+            first_line = f.readline()
+        if not (first_line.startswith(spec['header']) or first_line.startswith('ID,')):
+            with open(download_path, encoding='utf-8', errors='replace') as f:
+                print(f"✗ {name} response doesn't contain expected CSV headers. First 500 chars: {f.read(500)}")
+            raise Exception("Invalid CSV format")
+        
+        parse_start = time.time()
+        data = pd.read_csv(download_path)
+        LOAD_STAGE_SECONDS.set(time.time() - parse_start, source=name, stage='parse')
+        print(f"✓ Loaded {name} from Google Drive: {len(data)} records")
+        # Never store a snapshot of a file that isn't exactly the streamed body
+        if os.path.getsize(download_path) != file_size:
+            raise Exception(f"Downloaded file of {name} changed while it was parsed")
+        if use_snapshots:
+            save_snapshot(snapshot_dir, key, file_id, file_hash, data, validators)
+            print(f"✓ Saved {name} snapshot to {snapshot_dir}")
+        return data
+    
+    finally:
+        if os.path.exists(download_path):
+            os.remove(download_path)
+
+def source_load_state(future):
+    """Progress state of a finished load_source call"""
+    if future.exception() is not None:
+        return 'failed'
+    return 'loaded' if future.result() is not None else 'skipped'
+
+def load_data(refresh=False, progress=None, log_changes=True):
+    """Load all enabled databases and compile them into one dataset
+    
+    The databases are loaded concurrently, one thread per database. The new
+    dataset replaces the live one only once it is completely built, so searches
+    keep using the previous version while a reload is in progress. With refresh
+    set, a fresh local snapshot is not enough: files are checked against Google
+    Drive again. progress, if given, is called with each stage and with the
+    state of each database (see warmup.py). Without log_changes, release deltas
+    are applied but not written to the changelog.
+    """
+    global dataset
+    
+    load_start = time.time()
+    LOAD_STAGE_SECONDS.clear()
+    if progress is None:
+        progress = lambda state, source=None: None
+    
+    try:
+        print(f"Starting data load: {', '.join(SOURCE_COLUMNS)}")
+        
+        progress('loading')
+        with ThreadPoolExecutor(max_workers=max(len(SOURCES), 1), thread_name_prefix='load') as executor:
+            futures = []
+            for key, spec in SOURCES.items():
+                progress('pending', spec['source'])
+                future = executor.submit(load_source, key, spec, refresh)
+                future.add_done_callback(lambda future, name=spec['source']: progress(source_load_state(future), name))
+                futures.append((spec['source'], future))
+        
+        frames = []
+        failed = []
+        for name, future in futures:
             try:
-                print(f"Fetching from: {tscainv_url}")
-                
-                # First, get the file info to check if it's accessible
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                
-                # Try the direct download URL
-                download_url = f"https://drive.google.com/uc?export=download&id={tscainv_file_id}"
-                response = requests.get(download_url, headers=headers, timeout=120)
-                
-                print(f"Response status: {response.status_code}")
-                print(f"Content length: {len(response.content)}")
-                
-                if response.status_code == 200 and len(response.content) > 1000:
-                    # Check if we got actual CSV data
-                    content = response.text
-                    if 'ID,CASRN,casregno' in content or content.startswith('ID,'):
-                        tscainv_data = pd.read_csv(io.StringIO(content))
-                        print(f"✓ Loaded TSCAINV from Google Drive: {len(tscainv_data)} records")
-                    else:
-                        print(f"✗ Response doesn't contain expected CSV headers. First 500 chars: {content[:500]}")
-                        raise Exception("Invalid CSV format")
-                else:
-                    print(f"✗ Failed to get valid response. Status: {response.status_code}, Length: {len(response.content)}")
-                    raise Exception(f"HTTP {response.status_code}")
-                    
+                data = future.result()
             except Exception as e:
-                print(f"✗ Failed to load from Google Drive: {e}")
-                raise e
-        else:
-            print("No valid TSCAINV Google Drive file ID configured")
-            tscainv_data = None
-        
-        # Load PMNACC data (disabled for now)
-        pmnacc_data = None
+                print(f"✗ Failed to load {name}: {e}")
+                failed.append(name)
+                continue
+            if data is not None:
+                frames.append((name, data))
+        LOAD_STAGE_SECONDS.set(time.time() - load_start, source='all', stage='load')
         
         # Check if at least one database loaded
-        if tscainv_data is None:
+        if not frames:
             print("✗ No databases loaded successfully")
+            LOADS.inc(result='failed')
+            return False
+        
+        # A reload never drops a database that is being served because its new release failed
+        if failed and dataset is not None:
+            print(f"✗ Not all databases loaded ({', '.join(failed)}), keeping the current dataset")
+            LOADS.inc(result='failed')
             return False
         
+        index_start = time.time()
+        progress('indexing')
+        
+        # A new release of already loaded databases only costs its changed rows
+        new_dataset = None
+        if dataset is not None and DELTA_CONFIG.get('enabled', True):
+            new_dataset = apply_release_deltas(dataset, frames, log_changes)
+            LOAD_STAGE_SECONDS.set(time.time() - index_start, source='all', stage='delta')
+            if new_dataset is dataset:
+                print("✓ Databases unchanged, keeping the current dataset")
+                LOAD_STAGE_SECONDS.set(time.time() - load_start, source='all', stage='total')
+                LOADS.inc(result='unchanged')
+                return True
+        if new_dataset is None:
+            build_start = time.time()
+            new_dataset = build_dataset(frames, SOURCE_COLUMNS)
+            LOAD_STAGE_SECONDS.set(time.time() - build_start, source='all', stage='index')
+            print(f"✓ Built dataset: {len(new_dataset.cas_index)} CAS keys in {time.time() - build_start:.2f}s")
+        
+        if SHARED_DATA_CONFIG.get('enabled'):
+            progress('publishing')
+            publish_start = time.time()
+            new_dataset = publish_dataset(new_dataset, SHARED_DATA_CONFIG['directory'])
+            LOAD_STAGE_SECONDS.set(time.time() - publish_start, source='all', stage='publish')
+            print(f"✓ Published shared dataset to {new_dataset.directory}")
+        
+        # Swap in the new version: the assignment is atomic, in-flight requests keep the old object.
+        # The parsed frames are not kept, everything is served from the dataset's arrays.
+        dataset = new_dataset
+        cached_search_response_body.cache_clear()
+        
+        progress('done')
+        LOAD_STAGE_SECONDS.set(time.time() - load_start, source='all', stage='total')
+        LOADS.inc(result='loaded')
         print("✓ Data loading completed")
         return True
         
     except Exception as e:
         print(f"✗ Critical error loading data: {e}")
+        LOADS.inc(result='failed')
         return False
 
-def normalize_cas_number(cas_number):
-    """Remove dashes and spaces from CAS number"""
-    if pd.isna(cas_number):
-        return ""
-    return str(cas_number).replace('-', '').replace(' ', '')
+def apply_release_deltas(current, frames, log_changes=True):
+    """Update a dataset with the changed rows of each database release
+    
+    Returns current itself if nothing changed, None if the releases can't be
+    applied as deltas and a full build is needed.
+    """
+    if [source.name for source in current.sources] != [name for name, _ in frames]:
+        return None
+    
+    updated = current
+    try:
+        for name, data in frames:
+            delta_start = time.time()
+            updated, changes = apply_delta(updated, name, data, SOURCE_COLUMNS[name])
+            if changes and log_changes:
+                append_changes(DELTA_CONFIG['changelog'], updated.version, name, changes)
+            counts = {kind: sum(1 for change in changes if change['change'] == kind)
+                      for kind in ('added', 'removed', 'changed')}
+            print(f"✓ Applied {name} release: {counts['added']} added, {counts['removed']} removed, "
+                  f"{counts['changed']} changed in {time.time() - delta_start:.2f}s")
+    except ValueError as e:
+        print(f"✗ Can't apply release as a delta: {e}")
+        return None
+    
+    return updated
+
+def reload_data(database_key):
+    """Reload the databases for /api/update-database, returns the new dataset version"""
+    print(f"Reloading databases (requested for {database_key})...")
+    if not load_data(refresh=True):
+        raise Exception('Reload failed, still serving the previous version')
+    return dataset.version
+
+def parse_cas_key(cas_number):
+    """Integer lookup key for a CAS number, None if it can't be a valid CAS number
+    
+    Numbers with a wrong check digit are only accepted within the key range of a
+    loaded database keyed by accession numbers (PMNACC), which have no check digit.
+    """
+    key = encode_cas(cas_number)
+    if key is None:
+        return None
+    if is_valid_cas(key) or (dataset is not None and dataset.accepts_key(key)):
+        return key
+    return None
 
-def search_cas_number(normalized_cas):
+def search_cas_number(cas_key):
     """Search for CAS number in specified database(s)"""
-    results = []
-    
-    print(f"Searching for normalized CAS: '{normalized_cas}'")
-    print(f"TSCAINV data loaded: {tscainv_data is not None}")
-    if tscainv_data is not None:
-        print(f"TSCAINV data shape: {tscainv_data.shape}")
-        print(f"TSCAINV columns: {list(tscainv_data.columns)}")
-    
-    # Search in PMNACC data
-    if pmnacc_data is not None:
-        print(f"PMNACC data available: {len(pmnacc_data)} records")
-        # Check a few sample CAS numbers for debugging
-        sample_cas = pmnacc_data['ACCNO'].head(5).tolist()
-        print(f"Sample PMNACC CAS numbers: {sample_cas}")
-        
-        pmnacc_match = pmnacc_data[
-            pmnacc_data['ACCNO'].apply(lambda x: normalize_cas_number(x) == normalized_cas)
-        ]
-        
-        print(f"PMNACC matches found: {len(pmnacc_match)}")
-        
-        if not pmnacc_match.empty:
-            for _, row in pmnacc_match.iterrows():
-                results.append({
-                    'source': 'PMNACC',
-                    'casNumber': str(row['ACCNO']) if pd.notna(row['ACCNO']) else '',
-                    'chemicalName': str(row['GenericName']) if pd.notna(row['GenericName']) else '',
-                    'flag': str(row['FLAG']) if pd.notna(row['FLAG']) else '',
-                    'flagDescription': get_flag_description(row['FLAG']),
-                    'activity': str(row['ACTIVITY']) if pd.notna(row['ACTIVITY']) else ''
-                })
-    
-    # Search in TSCAINV data
-    if tscainv_data is not None:
-        print(f"TSCAINV data available: {len(tscainv_data)} records")
-        
-        # Convert casregno to string for comparison and handle NaN values
-        tscainv_data['casregno_str'] = tscainv_data['casregno'].fillna('').astype(str)
-        tscainv_data['CASRN_str'] = tscainv_data['CASRN'].fillna('').astype(str)
-        
-        # Check if the exact CAS number exists in the data
-        exact_match_casregno = tscainv_data[tscainv_data['casregno_str'] == normalized_cas]
-        exact_match_CASRN = tscainv_data[tscainv_data['CASRN_str'] == normalized_cas]
-        
-        print(f"Exact matches in casregno: {len(exact_match_casregno)}")
-        print(f"Exact matches in CASRN: {len(exact_match_CASRN)}")
-        
-        # Check a few sample CAS numbers for debugging
-        sample_cas = tscainv_data['casregno_str'].head(10).tolist()
-        print(f"Sample TSCAINV casregno: {sample_cas}")
-        sample_casrn = tscainv_data['CASRN_str'].head(10).tolist()
-        print(f"Sample TSCAINV CASRN: {sample_casrn}")
-        
-        # Try normalized search
-        tscainv_match = tscainv_data[
-            (tscainv_data['casregno_str'].apply(lambda x: normalize_cas_number(x) == normalized_cas)) |
-            (tscainv_data['CASRN_str'].apply(lambda x: normalize_cas_number(x) == normalized_cas))
-        ]
-        
-        print(f"TSCAINV normalized matches found: {len(tscainv_match)}")
-        
-        if not tscainv_match.empty:
-            for _, row in tscainv_match.iterrows():
-                results.append({
-                    'source': 'TSCAINV',
-                    'casNumber': str(row['CASRN']) if pd.notna(row['CASRN']) else str(row['casregno']) if pd.notna(row['casregno']) else '',
-                    'chemicalName': str(row['ChemName']) if pd.notna(row['ChemName']) else '',
-                    'flag': str(row['FLAG']) if pd.notna(row['FLAG']) else '',
-                    'flagDescription': get_flag_description(row['FLAG']),
-                    'activity': str(row['ACTIVITY']) if pd.notna(row['ACTIVITY']) else ''
-                })
-    else:
-        print("TSCAINV data is None - not loaded properly")
+    if dataset is None:
+        return []
+    
+    return dataset.records(cas_key)
+
+def search_response_body(data, cas_key):
+    """Serialized /api/search results for a CAS key in data, None if there are none
+    
+    Only results of the live dataset are cached. A request that started before a
+    reload swapped the dataset is answered from its own version without caching,
+    so no cache entry is left over from (or keeps in memory) a replaced version.
+    """
+    if data is dataset:
+        return cached_search_response_body(data.version, cas_key)
+    return results_body(data.records(cas_key))
+
+@functools.lru_cache(maxsize=SEARCH_CACHE_CONFIG['size'])
+def cached_search_response_body(version, cas_key):
+    """search_response_body of the live dataset, cached by dataset version and CAS key
+    
+    The key holds the version string, never the Dataset, and a reload clears the cache.
+    """
+    return results_body(dataset.records(cas_key))
+
+def results_body(results):
+    return json.dumps({'results': results}) if results else None
+
+def search_cas_numbers(cas_keys):
+    """Search for many CAS numbers at once, returns one result list per CAS number"""
+    if dataset is None:
+        return [[] for _ in cas_keys]
     
-    print(f"Total results found: {len(results)}")
-    return results
+    return dataset.records_many(cas_keys)
+
+def loaded_record_counts():
+    """Number of records per loaded database"""
+    return dataset.record_counts() if dataset is not None else {}
+
+def process_rss_bytes():
+    """Resident set size of this process, None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def batch_search_results(data, cas_numbers, columnar=False):
+    """Batch search response body for a list of CAS numbers, in input order
+    
+    Every input gets a status: 'found', 'not found' or 'invalid'. The grouped form
+    lists each input with its matches; the columnar form has one array per match
+    field, with matches pointing back to their input by position, and each flag
+    description listed once.
+    """
+    inputs = [str(value).strip() if isinstance(value, (str, int)) and not isinstance(value, bool) else value
+              for value in cas_numbers]
+    cas_keys = [parse_cas_key(value) if isinstance(value, str) and value else None for value in inputs]
+    positions = [position for position, key in enumerate(cas_keys) if key is not None]
+    matches = [[] for _ in inputs]
+    if data is not None and positions:
+        for position, found in zip(positions, data.find_many([cas_keys[position] for position in positions])):
+            matches[position] = found
+    
+    statuses = ['invalid' if key is None else 'found' if found else 'not found'
+                for key, found in zip(cas_keys, matches)]
+    summary = {
+        'total': len(inputs),
+        'found': statuses.count('found'),
+        'notFound': statuses.count('not found'),
+        'invalid': statuses.count('invalid')
+    }
+    
+    if not columnar:
+        results = []
+        for value, status, found in zip(inputs, statuses, matches):
+            item = {'input': value, 'status': status}
+            if found:
+                item['results'] = [source.record(row) for source, row in found]
+            results.append(item)
+        return {'results': results, 'summary': summary}
+    
+    columns = {'input': []}
+    columns.update((field, []) for field in BATCH_RESULT_FIELDS)
+    flag_descriptions = {}
+    for position, found in enumerate(matches):
+        for source, row in found:
+            record = source.record(row)
+            columns['input'].append(position)
+            for field in BATCH_RESULT_FIELDS:
+                columns[field].append(record[field])
+            flag_descriptions[record['flag']] = record['flagDescription']
+    return {'inputs': inputs, 'status': statuses, 'matches': columns, 'flagDescriptions': flag_descriptions,
+            'summary': summary}
+
+def iter_export_rows(values):
+    """Annotated rows for CAS numbers as given in a JSON request, with a row for each invalid one"""
+    for batch in iter_batches(values, STREAM_BATCH_SIZE):
+        cas_keys = [parse_cas_key(str(value).strip()) if isinstance(value, (str, int)) and not isinstance(value, bool)
+                    else None for value in batch]
+        yield from screened_rows(batch, cas_keys, search_cas_numbers([key for key in cas_keys if key is not None]))
+
+def json_response(body, status=200):
+    """JSON response, gzip-compressed when the client accepts it and it is large enough"""
+    payload = json.dumps(body, separators=(',', ':')).encode('utf-8')
+    response = Response(payload, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(payload) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(payload, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def paged_results(data, refs):
+    """One page of records for row references into data, using the page and pageSize query parameters"""
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = min(max(request.args.get('pageSize', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    start = (page - 1) * page_size
+    
+    return {
+        'results': data.records_for_refs(refs[start:start + page_size]),
+        'total': int(len(refs)),
+        'page': page,
+        'pageSize': page_size,
+        'pages': (int(len(refs)) + page_size - 1) // page_size
+    }
+
+def iter_cas_numbers(text_stream, filename):
+    """Yield the distinct valid CAS keys of an uploaded file while reading it"""
+    seen = set()
+    
+    # Every cell after the header row of a CSV file, every line of a text file
+    for value in iter_input_values(text_stream, filename):
+        key = parse_cas_key(value)
+        if key is not None and key not in seen:
+            seen.add(key)
+            yield key
 
 def extract_cas_numbers_from_file(file_content, filename):
     """Extract CAS numbers from uploaded file"""
-    cas_numbers = set()
-    
     try:
-        if filename.lower().endswith('.csv'):
-            # Parse CSV file
-            df = pd.read_csv(io.StringIO(file_content))
-            
-            # Look for columns that might contain CAS numbers
-            for column in df.columns:
-                for value in df[column].dropna():
-                    normalized = normalize_cas_number(value)
-                    if re.match(r'^\d{5,10}$', normalized):  # Basic CAS number validation
-                        cas_numbers.add(normalized)
-        else:
-            # Parse text file (one CAS number per line)
-            lines = file_content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line:
-                    normalized = normalize_cas_number(line)
-                    if re.match(r'^\d{5,10}$', normalized):
-                        cas_numbers.add(normalized)
+        return list(iter_cas_numbers(io.StringIO(file_content, newline=''), filename))
     
     except Exception as e:
         print(f"Error processing file: {e}")
         return []
-    
-    return list(cas_numbers)
 
 def get_google_drive_file_info(file_config):
     """Get file information from Google Drive using multiple strategies"""
@@ -302,6 +656,124 @@ def get_google_drive_file_info(file_config):
             'method': 'error'
         }
 
+def get_local_file_info(local_path):
+    """File information of a database read from its local file"""
+    if not local_path or not os.path.exists(local_path):
+        return {
+            'success': False,
+            'error': 'Local file not found',
+            'method': 'local_file'
+        }
+    
+    stat = os.stat(local_path)
+    return {
+        'success': True,
+        'method': 'local_file',
+        'last_modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+        'size': stat.st_size,
+        'file_name': os.path.basename(local_path)
+    }
+
+# Background screening jobs for very large CAS lists, see jobs.py
+job_manager = JobManager(
+    JOB_CONFIG['directory'],
+    extract=iter_cas_numbers,
+    search=search_cas_numbers,
+    workers=JOB_CONFIG.get('workers', 2),
+    batch_size=JOB_CONFIG.get('batch_size', 5000),
+    retention_hours=JOB_CONFIG.get('retention_hours', 24)
+)
+
+# Background database reloads for /api/update-database, see reloader.py
+reloader = Reloader(SNAPSHOT_CONFIG['directory'], reload=reload_data)
+
+# Loads the data at startup without blocking the worker, see warmup.py
+warmup = Warmup(load_data, retry_seconds=STARTUP_CONFIG.get('retry_seconds', 30))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency under its route pattern (not the raw path)"""
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if 'request_start' in g:
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, route=route, method=request.method)
+    REQUEST_COUNT.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.before_request
+def use_latest_shared_dataset():
+    """Switch to a dataset version published by another worker's reload (shared mode)"""
+    global dataset, last_shared_check
+    
+    if not SHARED_DATA_CONFIG.get('enabled'):
+        return
+    if time.time() - last_shared_check < SHARED_DATA_CONFIG.get('poll_seconds', 5):
+        return
+    last_shared_check = time.time()
+    
+    version = latest_version(SHARED_DATA_CONFIG['directory'])
+    if version is None or (dataset is not None and version <= dataset.version):
+        return
+    try:
+        dataset = Dataset.load(os.path.join(SHARED_DATA_CONFIG['directory'], version), mmap=True)
+        cached_search_response_body.cache_clear()
+        print(f"✓ Switched to shared dataset version {version}")
+    except Exception as e:
+        # The version may have been replaced again while loading, retry on the next poll
+        print(f"✗ Could not load shared dataset version {version}: {e}")
+
+@app.before_request
+def follow_other_worker_reloads():
+    """Reload this worker too once another worker completed a database update (not in shared mode)
+    
+    Outside shared mode each worker holds its own dataset and /api/update-database
+    only reloads the worker that received it. The others see the completed reload in
+    the reload status file and load the refreshed snapshots on a background thread.
+    """
+    global last_reload_check, followed_reload
+    
+    if SHARED_DATA_CONFIG.get('enabled') or dataset is None:
+        return
+    with follow_reload_lock:
+        if time.time() - last_reload_check < RELOAD_POLL_SECONDS:
+            return
+        last_reload_check = time.time()
+        
+        status = reloader.status()
+        if (status is None or status.get('status') != 'completed' or status.get('pid') == os.getpid()
+                or status.get('finishedAt') == followed_reload or status.get('version', '') <= dataset.version):
+            return
+        followed_reload = status['finishedAt']
+    
+    print(f"Database update completed in worker {status.get('pid')}, reloading this worker...")
+    threading.Thread(target=follow_reload, args=(status['finishedAt'],), name='follow-reload', daemon=True).start()
+
+def follow_reload(finished_at):
+    """Load the data again after another worker's update, retried on a later poll if it fails
+    
+    The worker that ran the update already wrote its changes to the changelog.
+    """
+    global followed_reload
+    
+    if not load_data(log_changes=False):
+        with follow_reload_lock:
+            if followed_reload == finished_at:
+                followed_reload = None
+
+@app.before_request
+def require_dataset():
+    """Answer 503 right away on routes that need the data while it is still loading"""
+    if dataset is not None or request.endpoint not in DATASET_ENDPOINTS:
+        return
+    response = jsonify({'error': 'The databases are still loading, please try again shortly',
+                        'warmup': warmup.status()})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(WARMUP_RETRY_AFTER)
+    return response
+
 @app.route('/')
 def index():
     """Main page"""
@@ -317,24 +789,197 @@ def flag_definitions():
     """Flag definitions page"""
     return render_template('flag_definitions.html', flag_definitions=FLAG_DEFINITIONS)
 
-@app.route('/api/search', methods=['POST'])
+@app.route('/api/search', methods=['GET', 'POST'])
 def search():
-    """API endpoint for searching CAS numbers"""
+    """API endpoint for searching CAS numbers
+    
+    GET /api/search?casNumber=... returns the same results as the POST form, with
+    ETag and Cache-Control headers so browsers and proxies can reuse them.
+    """
     try:
-        data = request.get_json()
-        cas_number = data.get('casNumber', '').strip()
-        database = data.get('database', 'all')
+        if request.method == 'GET':
+            cas_number = request.args.get('casNumber', '').strip()
+        else:
+            data = request.get_json()
+            cas_number = data.get('casNumber', '').strip()
+            database = data.get('database', 'all')
         
         if not cas_number:
             return jsonify({'error': 'Please provide a CAS number'}), 400
         
-        normalized_cas = normalize_cas_number(cas_number)
-        results = search_cas_number(normalized_cas)
+        cas_key = parse_cas_key(cas_number)
+        if cas_key is None:
+            return jsonify({'error': f'Invalid CAS number: {cas_number}'}), 400
         
-        if not results:
+        current = dataset
+        if current is None:
             return jsonify({'error': f'No results found for CAS number: {cas_number}'}), 404
         
-        return jsonify({'results': results})
+        body = search_response_body(current, cas_key)
+        
+        if body is None:
+            return jsonify({'error': f'No results found for CAS number: {cas_number}'}), 404
+        
+        # Results only change with the dataset version
+        response = Response(body, mimetype='application/json')
+        response.set_etag(f'{current.version}-{cas_key}')
+        response.cache_control.public = True
+        response.cache_control.max_age = SEARCH_CACHE_CONFIG['max_age_seconds']
+        return response.make_conditional(request)
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    """API endpoint for searching many CAS numbers in one request
+    
+    The body is a JSON array of CAS numbers, or an object with a 'casNumbers' array.
+    format=columns (query parameter or body field) selects the compact columnar
+    response. Responses are gzip-compressed for clients that accept it.
+    """
+    try:
+        body = request.get_json(silent=True)
+        columnar = request.args.get('format') == 'columns'
+        if isinstance(body, dict):
+            columnar = columnar or body.get('format') == 'columns'
+            body = body.get('casNumbers')
+        
+        if not isinstance(body, list) or not body:
+            return jsonify({'error': 'Please provide a JSON array of CAS numbers'}), 400
+        if len(body) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many CAS numbers: at most {MAX_BATCH_SIZE} per request'}), 413
+        
+        UPLOAD_CAS_NUMBERS.observe(len(body), endpoint='search_batch')
+        return json_response(batch_search_results(dataset, body, columnar))
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/search/prefix')
+def search_prefix():
+    """API endpoint for listing substances whose CAS number starts with the given digits
+    
+    Query parameters:
+      q          start of a CAS number, dashes optional, e.g. 110-2
+      page, pageSize
+    """
+    try:
+        # Keep using this version even if a reload swaps in a new one meanwhile
+        data = dataset
+        if data is None:
+            return jsonify({'error': 'Database is still loading'}), 503
+        
+        prefix = normalize_cas_number(request.args.get('q', '').strip())
+        if not prefix:
+            return jsonify({'error': 'Please provide the start of a CAS number'}), 400
+        if not prefix.isdigit():
+            return jsonify({'error': f'Invalid CAS number prefix: {prefix}'}), 400
+        
+        return jsonify(paged_results(data, data.find_prefix(prefix)))
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/query')
+def query_database():
+    """API endpoint for listing substances by flag codes and activity status
+    
+    Query parameters:
+      flags      comma-separated flag codes, e.g. 5E,S
+      match      'any' (default) or 'all' of the flag codes
+      activity   ACTIVITY value, e.g. ACTIVE
+      source     comma-separated database names, e.g. TSCAINV (default: all)
+      page, pageSize
+    """
+    try:
+        data = dataset
+        if data is None:
+            return jsonify({'error': 'Database is still loading'}), 503
+        
+        flag_codes = [code.strip().upper() for code in request.args.get('flags', '').split(',') if code.strip()]
+        unknown_flags = [code for code in flag_codes if code not in FLAG_BITS]
+        if unknown_flags:
+            return jsonify({'error': f'Unknown flag code(s): {", ".join(unknown_flags)}',
+                            'validFlags': list(FLAG_BITS)}), 400
+        
+        match = request.args.get('match', 'any').lower()
+        if match not in ('any', 'all'):
+            return jsonify({'error': "match must be 'any' or 'all'"}), 400
+        
+        activity = request.args.get('activity', '').strip().upper() or None
+        if not flag_codes and activity is None:
+            return jsonify({'error': 'Please provide flags and/or activity to filter by'}), 400
+        
+        source_names = None
+        if request.args.get('source'):
+            source_names = {name.strip().upper() for name in request.args['source'].split(',')}
+        
+        refs = data.query([FLAG_BITS[code] for code in flag_codes], match == 'all', activity, source_names)
+        return jsonify(paged_results(data, refs))
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/names/search')
+def search_names():
+    """API endpoint for full-text search of chemical names
+    
+    Query parameters:
+      q          words that must all appear in the name, e.g. sodium chloride
+      prefix     1 to also match words starting with the query words
+      page, pageSize
+    """
+    try:
+        data = dataset
+        if data is None:
+            return jsonify({'error': 'Database is still loading'}), 503
+        
+        text = request.args.get('q', '').strip()
+        if not text:
+            return jsonify({'error': 'Please provide a name to search for'}), 400
+        
+        refs = data.search_names(text, prefix=request.args.get('prefix') in ('1', 'true'))
+        return jsonify(paged_results(data, refs))
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/names/autocomplete')
+def autocomplete_names():
+    """API endpoint for chemical name suggestions while typing
+    
+    Query parameters:
+      q          partial name; every word is matched as a word prefix
+      limit      number of suggestions, shortest names first
+    """
+    try:
+        data = dataset
+        if data is None:
+            return jsonify({'error': 'Database is still loading'}), 503
+        
+        text = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', DEFAULT_SUGGESTIONS, type=int), 1), MAX_SUGGESTIONS)
+        if len(text) < MIN_AUTOCOMPLETE_LENGTH:
+            return jsonify({'query': text, 'suggestions': [], 'total': 0})
+        
+        refs = data.search_names(text, prefix=True)
+        # Rank a few extra rows so that repeated names still leave enough suggestions
+        suggestions = []
+        seen = set()
+        for record in data.records_for_refs(data.shortest_names(refs, limit * 4)):
+            if record['chemicalName'] in seen:
+                continue
+            seen.add(record['chemicalName'])
+            suggestions.append({
+                'name': record['chemicalName'],
+                'casNumber': record['casNumber'],
+                'source': record['source']
+            })
+            if len(suggestions) == limit:
+                break
+        
+        return jsonify({'query': text, 'suggestions': suggestions, 'total': int(len(refs))})
     
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
@@ -353,19 +998,21 @@ def upload_file():
             return jsonify({'error': 'No file selected'}), 400
         
         # Read file content
-        file_content = file.read().decode('utf-8')
+        file_bytes = file.read()
+        file_content = file_bytes.decode('utf-8')
         filename = secure_filename(file.filename)
         
         # Extract CAS numbers from file
         cas_numbers = extract_cas_numbers_from_file(file_content, filename)
+        UPLOAD_BYTES.observe(len(file_bytes), endpoint='upload')
+        UPLOAD_CAS_NUMBERS.observe(len(cas_numbers), endpoint='upload')
         
         if not cas_numbers:
             return jsonify({'error': 'No valid CAS numbers found in the uploaded file'}), 400
         
-        # Search for all CAS numbers
+        # Search for all CAS numbers in a single pass over the index
         all_results = []
-        for cas in cas_numbers:
-            results = search_cas_number(cas)
+        for results in search_cas_numbers(cas_numbers):
             all_results.extend(results)
         
         if not all_results:
@@ -376,43 +1023,219 @@ def upload_file():
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/upload/stream', methods=['POST'])
+def upload_file_stream():
+    """API endpoint for large uploads: reads the file in chunks and streams matches back as NDJSON
+    
+    Accepts either a multipart 'file' field (like /api/upload) or the raw file as the request
+    body, with its name in the 'filename' query parameter. Every output line is one result
+    object; the last line is a summary ({"done": true, ...}) or an error ({"error": ...}).
+    """
+    try:
+        if 'file' in request.files:
+            file = request.files['file']
+            filename = secure_filename(file.filename)
+            stream = file.stream
+        else:
+            filename = secure_filename(request.args.get('filename', ''))
+            stream = request.stream
+        
+        if filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        if request.content_length is not None:
+            UPLOAD_BYTES.observe(request.content_length, endpoint='upload_stream')
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+    
+    def generate():
+        cas_count = 0
+        match_count = 0
+        
+        try:
+            for batch in iter_batches(iter_cas_numbers(text_stream, filename), STREAM_BATCH_SIZE):
+                cas_count += len(batch)
+                for results in search_cas_numbers(batch):
+                    for result in results:
+                        match_count += 1
+                        yield json.dumps(result) + '\n'
+            
+            UPLOAD_CAS_NUMBERS.observe(cas_count, endpoint='upload_stream')
+            yield json.dumps({'done': True, 'casNumbers': cas_count, 'matches': match_count}) + '\n'
+        
+        except Exception as e:
+            yield json.dumps({'error': f'Server error: {str(e)}'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/export', methods=['POST'])
+def export_results():
+    """API endpoint for downloading annotated search results as CSV (or XLSX with format=xlsx)
+    
+    Takes an uploaded file like /api/upload/stream (a multipart 'file' field, or the raw
+    file as the body with its name in the 'filename' query parameter), or a JSON array of
+    CAS numbers like /api/search/batch. Rows are produced and written batch by batch, so
+    memory use doesn't depend on the number of results.
+    """
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'xlsx'):
+            return jsonify({'error': f'Unknown export format: {export_format}'}), 400
+        if export_format == 'xlsx' and not xlsx_available():
+            return jsonify({'error': 'XLSX export needs the openpyxl package, use format=csv'}), 501
+        
+        if request.is_json:
+            # JSON bodies are parsed whole, so they get the normal upload size limit
+            if request.content_length is not None and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+                return jsonify({'error': 'Request too large, upload the CAS numbers as a file instead'}), 413
+            body = request.get_json(silent=True)
+            if isinstance(body, dict):
+                body = body.get('casNumbers')
+            if not isinstance(body, list) or not body:
+                return jsonify({'error': 'Please provide a JSON array of CAS numbers'}), 400
+            rows = iter_export_rows(body)
+        else:
+            if 'file' in request.files:
+                file = request.files['file']
+                filename = secure_filename(file.filename)
+                stream = file.stream
+            else:
+                filename = secure_filename(request.args.get('filename', ''))
+                stream = request.stream
+            if filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            
+            text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+            cas_batches = iter_batches(iter_cas_numbers(text_stream, filename), STREAM_BATCH_SIZE)
+            rows = (row for batch in cas_batches for row in annotated_rows(batch, search_cas_numbers(batch)))
+        
+        if export_format == 'xlsx':
+            # The workbook can only be sent once complete; openpyxl keeps its rows on disk
+            workbook_file = tempfile.TemporaryFile()
+            write_xlsx(rows, workbook_file)
+            workbook_file.seek(0)
+            return send_file(workbook_file, mimetype=XLSX_MIMETYPE, as_attachment=True,
+                             download_name='cas_results.xlsx')
+        
+        response = Response(stream_with_context(csv_chunks(rows)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=cas_results.csv'
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """API endpoint for screening a large file of CAS numbers in the background"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        job_id = job_manager.submit(file, secure_filename(file.filename))
+        if request.content_length is not None:
+            UPLOAD_BYTES.observe(request.content_length, endpoint='jobs')
+        return jsonify({'jobId': job_id, 'status': 'queued'}), 202
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """API endpoint for the progress of a background job"""
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if status['casTotal']:
+        status['progress'] = round(100 * status['casProcessed'] / status['casTotal'], 1)
+    else:
+        status['progress'] = 100.0 if status['status'] == 'completed' else 0.0
+    
+    return jsonify(status)
+
+@app.route('/api/jobs/<job_id>/result')
+def job_result(job_id):
+    """API endpoint for downloading the annotated result file of a completed job"""
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    result_path = job_manager.result_path(job_id)
+    if result_path is None:
+        return jsonify({'error': f'Job is {status["status"]}, results are not available'}), 409
+    
+    download_name = f"{os.path.splitext(status['filename'])[0] or 'cas'}_results.csv"
+    return send_file(os.path.abspath(result_path), mimetype='text/csv',
+                     as_attachment=True, download_name=download_name)
+
 @app.route('/api/update-database', methods=['POST'])
 def update_database():
-    """API endpoint for updating database from Google Drive"""
+    """API endpoint for updating a database from Google Drive or its local file
+    
+    The download and index build run in the background, searches keep using the
+    current data until the new version is ready.
+    """
     try:
         data = request.get_json()
         database_key = data.get('database')
         
-        if database_key not in GOOGLE_DRIVE_FILES:
+        if database_key not in SOURCES_CONFIG:
             return jsonify({'error': 'Invalid database specified'}), 400
         
-        database_info = GOOGLE_DRIVE_FILES[database_key]
-        
-        if not database_info.get('enabled', True):
+        if database_key not in SOURCES:
             return jsonify({'error': 'This database is currently disabled'}), 400
         
-        # For now, simulate the update process
-        # In the future, this will:
-        # 1. Download new file from Google Drive
-        # 2. Replace the existing file content (same file ID)
-        # 3. Update the local database
-        # 4. Reload the data
-        
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if not reloader.start(database_key):
+            return jsonify({'error': 'A database update is already running',
+                            'status': reloader.status()}), 409
         
-        # Simulate update process
-        update_status = {
+        return jsonify({
             'success': True,
-            'message': f'{database_info["name"]} update initiated',
-            'timestamp': current_time,
-            'details': {
-                'method': 'Google Drive API Replace',
-                'file_id': database_info.get('file_id', 'Not configured'),
-                'status': 'Update will replace file content while keeping same file ID'
-            }
-        }
+            'message': f'{database_name(database_key)} update started',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'currentVersion': dataset.version if dataset is not None else None,
+            'statusUrl': '/api/update-database/status'
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/update-database/status')
+def update_database_status():
+    """API endpoint for the progress of the last database update"""
+    try:
+        return jsonify({
+            'update': reloader.status(),
+            'running': reloader.is_running(),
+            'currentVersion': dataset.version if dataset is not None else None
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/changelog')
+def changelog():
+    """API endpoint for changes between database releases
+    
+    With ?cas=<CAS number> returns every change of that substance, otherwise
+    the number of added, removed and changed rows per release.
+    """
+    try:
+        cas_number = request.args.get('cas', '').strip()
+        if not cas_number:
+            return jsonify({'releases': release_summaries(DELTA_CONFIG['changelog'])})
         
-        return jsonify(update_status)
+        cas_key = encode_cas(cas_number)
+        if cas_key is None:
+            return jsonify({'error': f'Invalid CAS number: {cas_number}'}), 400
+        
+        return jsonify({'casNumber': cas_number, 'changes': changes_for_cas(DELTA_CONFIG['changelog'], cas_key)})
     
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
@@ -422,98 +1245,134 @@ def database_info():
     """API endpoint for getting database information"""
     try:
         info = {}
-        for key, db_info in GOOGLE_DRIVE_FILES.items():
-            if db_info.get('enabled', True):
-                file_info = get_google_drive_file_info(db_info)
-                info[key] = {
-                    'name': db_info['name'],
-                    'last_updated': db_info.get('last_updated', 'Unknown'),
-                    'file_info': file_info,
-                    'local_loaded': {
-                        'tscainv': tscainv_data is not None,
-                        'pmnacc': pmnacc_data is not None
-                    }[key] if key in ['tscainv', 'pmnacc'] else False
-                }
+        record_counts = loaded_record_counts()
+        for key, spec in SOURCES.items():
+            if drive_file_id(key) is not None:
+                file_info = get_google_drive_file_info(GOOGLE_DRIVE_FILES[key])
+            else:
+                file_info = get_local_file_info(LOCAL_FILES.get(key))
+            info[key] = {
+                'name': database_name(key),
+                'last_updated': GOOGLE_DRIVE_FILES.get(key, {}).get('last_updated',
+                                                                     file_info.get('last_modified', 'Unknown')),
+                'file_info': file_info,
+                'local_loaded': spec['source'] in record_counts
+            }
         
         return jsonify(info)
     
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Metrics in the Prometheus text format"""
+    current = dataset
+    cache_info = cached_search_response_body.cache_info()
+    lookups = cache_info.hits + cache_info.misses
+    SEARCH_CACHE.set(cache_info.hits, stat='hits')
+    SEARCH_CACHE.set(cache_info.misses, stat='misses')
+    SEARCH_CACHE.set(cache_info.currsize, stat='entries')
+    SEARCH_CACHE.set(cache_info.hits / lookups if lookups else 0.0, stat='hit_ratio')
+    
+    DATASET_INFO.clear()
+    DATASET_RECORDS.clear()
+    if current is not None:
+        DATASET_INFO.set(1, version=current.version)
+        for source, count in current.record_counts().items():
+            DATASET_RECORDS.set(count, source=source)
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/memory')
+def memory_report():
+    """Bytes used by the loaded dataset per database and per index, and the process RSS"""
+    try:
+        data = dataset
+        report = {
+            'loaded': data is not None,
+            'memoryMapped': data is not None and data.directory is not None,
+            'processRssBytes': process_rss_bytes()
+        }
+        if data is not None:
+            report['datasetVersion'] = data.version
+            report.update(data.memory_usage())
+        return jsonify(report)
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/health')
 def health_check():
-    """Health check endpoint"""
-    global pmnacc_data, tscainv_data
+    """Health check endpoint
+    
+    Always answers 200 while the process is up (liveness); 'ready' tells whether
+    the data is loaded, and 'warmup' how far loading has got.
+    """
+    record_counts = loaded_record_counts()
     
     status = {
-        'status': 'healthy',
-        'data_loaded': {
-            'tscainv': tscainv_data is not None,
-            'pmnacc': pmnacc_data is not None
-        },
-        'record_counts': {
-            'tscainv': len(tscainv_data) if tscainv_data is not None else 0,
-            'pmnacc': len(pmnacc_data) if pmnacc_data is not None else 0
-        },
-        'total_records': (len(tscainv_data) if tscainv_data is not None else 0) + 
-                        (len(pmnacc_data) if pmnacc_data is not None else 0)
+        'status': 'healthy' if dataset is not None else 'starting',
+        'live': True,
+        'ready': dataset is not None,
+        'warmup': warmup.status(),
+        'data_loaded': {key: spec['source'] in record_counts for key, spec in SOURCES_CONFIG.items()},
+        'record_counts': {key: record_counts.get(spec['source'], 0) for key, spec in SOURCES_CONFIG.items()},
+        'total_records': sum(record_counts.values()),
+        'dataset_version': dataset.version if dataset is not None else None,
+        'shared_data': dataset is not None and dataset.directory is not None,
+        'search_cache': cached_search_response_body.cache_info()._asdict()
     }
     
     return jsonify(status)
 
+@app.route('/api/health/live')
+def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'live': True})
+
+@app.route('/api/health/ready')
+def readiness_check():
+    """Readiness probe: 200 once the data is loaded, 503 while it is still loading"""
+    if dataset is None:
+        return jsonify({'ready': False, 'warmup': warmup.status()}), 503
+    return jsonify({'ready': True, 'dataset_version': dataset.version})
+
 @app.route('/api/debug/<cas_number>')
 def debug_search(cas_number):
     """Debug endpoint to test CAS number search"""
     try:
         normalized_cas = normalize_cas_number(cas_number)
+        cas_key = encode_cas(cas_number)
+        data = dataset
+        record_counts = data.record_counts() if data is not None else {}
+        matches = []
+        if data is not None and cas_key is not None:
+            matches = data.find(cas_key)
         
         debug_info = {
             'original_cas': cas_number,
             'normalized_cas': normalized_cas,
-            'data_loaded': {
-                'tscainv': tscainv_data is not None,
-                'pmnacc': pmnacc_data is not None
-            }
+            'valid_check_digit': cas_key is not None and is_valid_cas(cas_key),
+            'data_loaded': {key: spec['source'] in record_counts for key, spec in SOURCES_CONFIG.items()}
         }
         
-        if tscainv_data is not None:
-            debug_info['tscainv_info'] = {
-                'total_records': len(tscainv_data),
-                'sample_casregno': tscainv_data['casregno'].head(10).tolist(),
-                'sample_casrn': tscainv_data['CASRN'].head(10).tolist(),
-                'columns': list(tscainv_data.columns)
-            }
+        for key, spec in SOURCES.items():
+            if spec['source'] not in record_counts:
+                continue
+            source = next(source for source in data.sources if source.name == spec['source'])
+            source_rows = [row for match_source, row in matches if match_source is source]
+            debug_info[f'{key}_normalized_matches'] = len(source_rows)
             
-            # Check for exact matches
-            exact_matches = tscainv_data[
-                (tscainv_data['casregno'] == normalized_cas) |
-                (tscainv_data['CASRN'] == normalized_cas)
-            ]
-            debug_info['tscainv_exact_matches'] = len(exact_matches)
-            
-            # Check for normalized matches
-            normalized_matches = tscainv_data[
-                (tscainv_data['casregno'].apply(lambda x: normalize_cas_number(x) == normalized_cas)) |
-                (tscainv_data['CASRN'].apply(lambda x: normalize_cas_number(x) == normalized_cas))
-            ]
-            debug_info['tscainv_normalized_matches'] = len(normalized_matches)
-        
-        if pmnacc_data is not None:
-            debug_info['pmnacc_info'] = {
-                'total_records': len(pmnacc_data),
-                'sample_accno': pmnacc_data['ACCNO'].head(10).tolist(),
-                'columns': list(pmnacc_data.columns)
+            debug_info[f'{key}_info'] = {
+                'total_records': record_counts[spec['source']],
+                'sample_cas': [source.columns['casNumber'][row] for row in np.flatnonzero(source.live)[:10]],
+                'columns': {field: column.meta()['type'] for field, column in source.columns.items()}
             }
             
-            # Check for exact matches
-            exact_matches = pmnacc_data[pmnacc_data['ACCNO'] == normalized_cas]
-            debug_info['pmnacc_exact_matches'] = len(exact_matches)
-            
-            # Check for normalized matches
-            normalized_matches = pmnacc_data[
-                pmnacc_data['ACCNO'].apply(lambda x: normalize_cas_number(x) == normalized_cas)
-            ]
-            debug_info['pmnacc_normalized_matches'] = len(normalized_matches)
+            # Check for exact matches of the CAS number as displayed
+            debug_info[f'{key}_exact_matches'] = sum(
+                1 for row in source_rows if normalize_cas_number(source.columns['casNumber'][row]) == normalized_cas)
         
         return jsonify(debug_info)
     
@@ -525,11 +1384,13 @@ def test_data():
     """Test endpoint to check data loading"""
     import os
     
+    data = dataset
+    record_counts = data.record_counts() if data is not None else {}
     result = {
-        'tscainv_loaded': tscainv_data is not None,
-        'pmnacc_loaded': pmnacc_data is not None,
-        'tscainv_count': int(len(tscainv_data)) if tscainv_data is not None else 0,
-        'pmnacc_count': int(len(pmnacc_data)) if pmnacc_data is not None else 0,
+        'tscainv_loaded': 'TSCAINV' in record_counts,
+        'pmnacc_loaded': 'PMNACC' in record_counts,
+        'tscainv_count': record_counts.get('TSCAINV', 0),
+        'pmnacc_count': record_counts.get('PMNACC', 0),
         'google_drive_config': {
             'tscainv_file_id': GOOGLE_DRIVE_FILES.get('tscainv', {}).get('file_id'),
             'tscainv_enabled': GOOGLE_DRIVE_FILES.get('tscainv', {}).get('enabled'),
@@ -544,25 +1405,18 @@ def test_data():
         }
     }
     
-    if tscainv_data is not None:
+    if 'TSCAINV' in record_counts:
+        source = next(source for source in data.sources if source.name == 'TSCAINV')
         result['tscainv_sample'] = {
-            'columns': list(tscainv_data.columns),
-            'first_5_casregno': [str(x) for x in tscainv_data['casregno'].head(5).tolist()],
-            'first_5_CASRN': [str(x) for x in tscainv_data['CASRN'].head(5).tolist()],
-            'casregno_dtype': str(tscainv_data['casregno'].dtype),
-            'CASRN_dtype': str(tscainv_data['CASRN'].dtype)
+            'columns': {field: column.meta()['type'] for field, column in source.columns.items()},
+            'first_5_casNumber': [source.columns['casNumber'][row] for row in np.flatnonzero(source.live)[:5]]
         }
         
         # Check if 110203 exists
-        cas_110203 = tscainv_data[tscainv_data['casregno'] == 110203]
+        cas_110203 = [row for match_source, row in data.find(110203) if match_source is source]
         result['cas_110203_exists'] = len(cas_110203) > 0
-        if len(cas_110203) > 0:
-            result['cas_110203_data'] = {
-                'casregno': str(cas_110203.iloc[0]['casregno']) if pd.notna(cas_110203.iloc[0]['casregno']) else '',
-                'CASRN': str(cas_110203.iloc[0]['CASRN']) if pd.notna(cas_110203.iloc[0]['CASRN']) else '',
-                'ChemName': str(cas_110203.iloc[0]['ChemName']) if pd.notna(cas_110203.iloc[0]['ChemName']) else '',
-                'ACTIVITY': str(cas_110203.iloc[0]['ACTIVITY']) if pd.notna(cas_110203.iloc[0]['ACTIVITY']) else ''
-            }
+        if cas_110203:
+            result['cas_110203_data'] = source.record(cas_110203[0])
     
     return jsonify(result)
 
@@ -607,51 +1461,50 @@ def test_google_drive():
 def test_cas_number(cas_number):
     """Test if a specific CAS number exists in the loaded data"""
     try:
+        # Read-only: lookups go through the immutable dataset, never the parsed frames
+        data = dataset
+        record_counts = data.record_counts() if data is not None else {}
+        cas_key = encode_cas(cas_number)
+        
         result = {
             'cas_number': cas_number,
             'normalized_cas': normalize_cas_number(cas_number),
-            'tscainv_loaded': tscainv_data is not None,
-            'pmnacc_loaded': pmnacc_data is not None
+            'tscainv_loaded': 'TSCAINV' in record_counts,
+            'pmnacc_loaded': 'PMNACC' in record_counts
         }
         
-        if tscainv_data is not None:
-            # Convert to string and handle NaN
-            tscainv_data['casregno_str'] = tscainv_data['casregno'].fillna('').astype(str)
-            tscainv_data['CASRN_str'] = tscainv_data['CASRN'].fillna('').astype(str)
-            
-            normalized_cas = normalize_cas_number(cas_number)
-            
-            # Check exact matches
-            exact_casregno = tscainv_data[tscainv_data['casregno_str'] == normalized_cas]
-            exact_CASRN = tscainv_data[tscainv_data['CASRN_str'] == normalized_cas]
+        if 'TSCAINV' in record_counts:
+            source = next(source for source in data.sources if source.name == 'TSCAINV')
+            matches = [row for match_source, row in (data.find(cas_key) if cas_key is not None else [])
+                       if match_source is source]
+            sample_rows = np.flatnonzero(source.live)[:5]
             
             result['tscainv'] = {
-                'total_records': int(len(tscainv_data)),  # Convert to native Python int
-                'exact_casregno_matches': int(len(exact_casregno)),
-                'exact_CASRN_matches': int(len(exact_CASRN)),
-                'sample_casregno': tscainv_data['casregno_str'].head(5).tolist(),
-                'sample_CASRN': tscainv_data['CASRN_str'].head(5).tolist()
+                'total_records': record_counts['TSCAINV'],
+                'exact_matches': len(matches),
+                'sample_casNumber': [source.columns['casNumber'][row] for row in sample_rows]
             }
             
-            if len(exact_casregno) > 0:
-                result['tscainv']['found_data'] = {
-                    'casregno': str(exact_casregno.iloc[0]['casregno']) if pd.notna(exact_casregno.iloc[0]['casregno']) else '',
-                    'CASRN': str(exact_casregno.iloc[0]['CASRN']) if pd.notna(exact_casregno.iloc[0]['CASRN']) else '',
-                    'ChemName': str(exact_casregno.iloc[0]['ChemName']) if pd.notna(exact_casregno.iloc[0]['ChemName']) else '',
-                    'ACTIVITY': str(exact_casregno.iloc[0]['ACTIVITY']) if pd.notna(exact_casregno.iloc[0]['ACTIVITY']) else ''
-                }
+            if matches:
+                result['tscainv']['found_data'] = source.record(matches[0])
         
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)})
 
-# Load data on startup (for both development and production)
-print("Starting application and loading data...")
-if load_data():
-    print("✓ Data loaded successfully")
+# Load data on startup (for both development and production). The worker starts serving at
+# once and loads the data in the background. In shared data mode the master process loads it
+# before forking the workers (see gunicorn.conf.py), which needs it loaded synchronously.
+if STARTUP_CONFIG.get('background', True) and not SHARED_DATA_CONFIG.get('enabled'):
+    print("Starting application, loading data in the background...")
+    warmup.start()
 else:
-    print("✗ Failed to load data - application may not work properly")
+    print("Starting application and loading data...")
+    if warmup.run_once():
+        print("✓ Data loaded successfully")
+    else:
+        print("✗ Failed to load data - application may not work properly")
 
 if __name__ == '__main__':
     # Run the app
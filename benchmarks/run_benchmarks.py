@@ -0,0 +1,329 @@
+# Offline benchmarks for single lookups, bulk uploads and startup
+#
+# Usage (from the repository root):
+#   python benchmarks/run_benchmarks.py                      # writes benchmark_report.json
+#   python benchmarks/run_benchmarks.py --output after.json --compare before.json
+#
+# Nothing is fetched from the network: the TSCA Inventory is a seeded synthetic
+# file of the real size (see synthetic_data.py), served to load_data in place of
+# Google Drive, and PMNACC is the bundled PMNACC_012025.csv. Everything runs in a
+# temporary directory, so the local data_cache is not touched.
+#
+# Measured:
+#   startup  time until app.py is imported (the worker can serve) and until the data is
+#            ready, cold (download, parse, index build, snapshot write) and warm (from
+#            the local snapshot), each in a fresh process, with its peak RSS
+#   lookup   p50/p99 of search_cas_number and of POST /api/search, uncached and cached
+#   upload   CAS numbers per second for 10k and 100k CAS files through the parser,
+#            the batched search, POST /api/upload and POST /api/upload/stream, and
+#            for 10k CAS numbers through POST /api/search/batch
+#
+# The report is JSON, so runs on different commits can be compared with --compare.
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+from email.utils import formatdate
+
+import numpy as np
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic_data import TSCAINV_RECORDS, write_tscainv, random_cas_keys, dashed_cas, upload_text
+
+PMNACC_FILE = os.path.join(REPO_DIR, 'PMNACC_012025.csv')
+
+LOOKUP_HITS = 2000
+LOOKUP_MISSES = 500
+UPLOAD_SIZES = (10000, 100000)
+
+
+class LocalDriveResponse:
+    """Stands in for a Google Drive download response, serving a local file"""
+
+    def __init__(self, path, request_headers):
+        with open(path, 'rb') as f:
+            self.content = f.read()
+        stat = os.stat(path)
+        self.headers = {
+            'ETag': '"' + hashlib.md5(self.content).hexdigest() + '"',
+            'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+            'Content-Length': str(len(self.content))
+        }
+        self.status_code = 200
+        if request_headers.get('If-None-Match') == self.headers['ETag']:
+            self.status_code = 304
+            self.content = b''
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def serve_drive_files_from(path):
+    """Answer every requests.get to Google Drive with the file at path, refuse other URLs"""
+    def get(url, *args, **kwargs):
+        if 'drive.google.com' not in url:
+            raise requests.ConnectionError(f"Benchmarks run offline, refused {url}")
+        return LocalDriveResponse(path, kwargs.get('headers') or {})
+    requests.get = get
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def latency_stats(samples):
+    """p50/p99/mean/max in milliseconds of a list of durations in seconds"""
+    millis = np.array(samples) * 1000
+    return {
+        'count': len(samples),
+        'p50Ms': round(float(np.percentile(millis, 50)), 4),
+        'p99Ms': round(float(np.percentile(millis, 99)), 4),
+        'meanMs': round(float(millis.mean()), 4),
+        'maxMs': round(float(millis.max()), 4)
+    }
+
+
+def throughput(cas_count, seconds):
+    return {'seconds': round(seconds, 4), 'casPerSecond': round(cas_count / seconds) if seconds else None}
+
+
+def import_app(workdir, tscainv_path):
+    """Import app.py (which starts loading the data) in workdir, with Google Drive served locally"""
+    os.chdir(workdir)
+    serve_drive_files_from(tscainv_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
+
+
+def wait_until_ready(app):
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not app.warmup.wait(timeout=600):
+            raise RuntimeError('Data did not load within 10 minutes')
+
+
+def startup_child(workdir, tscainv_path):
+    """Time the import of app.py in this process and print the result as JSON"""
+    start = time.perf_counter()
+    app = import_app(workdir, tscainv_path)
+    import_seconds = time.perf_counter() - start
+    wait_until_ready(app)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'importSeconds': round(import_seconds, 4),
+        'seconds': round(seconds, 4),
+        'loaded': app.dataset is not None,
+        'records': app.loaded_record_counts(),
+        'stageSeconds': {f'{source}.{stage}': round(value, 4)
+                         for (source, stage), value in app.LOAD_STAGE_SECONDS.values.items()},
+        'peakRssMb': peak_rss_mb()
+    }))
+
+
+def measure_startup(workdir, tscainv_path):
+    """Time a cold and a warm start, each in a new interpreter"""
+    results = {}
+    for phase in ('cold', 'warm'):
+        if phase == 'cold':
+            shutil.rmtree(os.path.join(workdir, 'data_cache'), ignore_errors=True)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--startup-child', workdir, '--tscainv', tscainv_path],
+            capture_output=True, text=True, check=True).stdout
+        results[phase] = json.loads(output.strip().splitlines()[-1])
+        print(f"✓ {phase} startup: serving after {results[phase]['importSeconds']:.2f}s, "
+              f"data ready after {results[phase]['seconds']:.2f}s, peak RSS {results[phase]['peakRssMb']}MB")
+    return results
+
+
+def measure_lookups(app, tscainv_keys):
+    """Latency of single CAS lookups, directly and through the search endpoint"""
+    rng = np.random.default_rng(1)
+    hits = rng.choice(np.unique(tscainv_keys), size=LOOKUP_HITS, replace=False)
+    misses = random_cas_keys(LOOKUP_MISSES, seed=2, exclude=tscainv_keys)
+    keys = rng.permutation(np.concatenate([hits, misses]))
+    cas_numbers = list(dashed_cas(keys))
+    client = app.app.test_client()
+
+    direct = []
+    for key in keys.tolist():
+        start = time.perf_counter()
+        app.search_cas_number(key)
+        direct.append(time.perf_counter() - start)
+
+    results = {'searchCasNumber': latency_stats(direct)}
+    # The first pass fills the search cache, the second one is served from it
+    for phase in ('endpointUncached', 'endpointCached'):
+        samples = []
+        for cas_number in cas_numbers:
+            start = time.perf_counter()
+            client.post('/api/search', json={'casNumber': cas_number}).get_data()
+            samples.append(time.perf_counter() - start)
+        results[phase] = latency_stats(samples)
+
+    for name, stats in results.items():
+        print(f"✓ lookup {name}: p50 {stats['p50Ms']:.3f}ms, p99 {stats['p99Ms']:.3f}ms")
+    return results
+
+
+def measure_upload(app, tscainv_keys, size):
+    """Throughput of a text upload of size CAS numbers, half of them in the database"""
+    content = upload_text(tscainv_keys, size, seed=size)
+    client = app.app.test_client()
+    results = {'bytes': len(content)}
+
+    start = time.perf_counter()
+    cas_keys = app.extract_cas_numbers_from_file(content, 'upload.txt')
+    results['extract'] = throughput(size, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    app.search_cas_numbers(cas_keys)
+    results['search'] = throughput(size, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    response = client.post('/api/upload', data={'file': (io.BytesIO(content.encode('utf-8')), 'upload.txt')},
+                           content_type='multipart/form-data')
+    response.get_data()
+    results['uploadEndpoint'] = throughput(size, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    response = client.post('/api/upload/stream?filename=upload.txt', data=content.encode('utf-8'))
+    response.get_data()
+    results['streamEndpoint'] = throughput(size, time.perf_counter() - start)
+
+    if size <= app.MAX_BATCH_SIZE:
+        cas_numbers = content.split()
+        start = time.perf_counter()
+        client.post('/api/search/batch?format=columns', json=cas_numbers,
+                    headers={'Accept-Encoding': 'gzip'}).get_data()
+        results['batchEndpoint'] = throughput(size, time.perf_counter() - start)
+
+    print(f"✓ upload of {size} CAS numbers: {results['uploadEndpoint']['seconds']:.2f}s "
+          f"(streamed {results['streamEndpoint']['seconds']:.2f}s)")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def numeric_leaves(report, prefix=''):
+    """Flatten a report to {'lookup.endpointCached.p50Ms': value, ...}"""
+    leaves = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            leaves.update(numeric_leaves(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            leaves[path] = value
+    return leaves
+
+
+def print_comparison(baseline, report):
+    """Print every measurement of report next to the same measurement in baseline"""
+    before = numeric_leaves(baseline['results'])
+    after = numeric_leaves(report['results'])
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for path, value in after.items():
+        if path not in before:
+            continue
+        change = f"{(value - before[path]) / before[path] * 100:+.1f}%" if before[path] else 'n/a'
+        print(f"  {path}: {before[path]} -> {value} ({change})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the CAS database app')
+    parser.add_argument('--records', type=int, default=TSCAINV_RECORDS, help='rows in the synthetic TSCAINV')
+    parser.add_argument('--output', default='benchmark_report.json', help='where to write the JSON report')
+    parser.add_argument('--compare', help='earlier report to compare the results with')
+    parser.add_argument('--startup-child', help=argparse.SUPPRESS)
+    parser.add_argument('--tscainv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_child:
+        startup_child(args.startup_child, args.tscainv)
+        return
+
+    output = os.path.abspath(args.output)
+    workdir = tempfile.mkdtemp(prefix='cas-benchmark-')
+    try:
+        tscainv_path = os.path.join(workdir, 'TSCAINV_synthetic.csv')
+        tscainv_keys = write_tscainv(tscainv_path, args.records)
+        print(f"✓ Generated synthetic TSCAINV: {args.records} records")
+        # PMNACC has no Google Drive file ID, load_data reads it from the working directory
+        shutil.copy(PMNACC_FILE, workdir)
+
+        startup = measure_startup(workdir, tscainv_path)
+
+        app = import_app(workdir, tscainv_path)
+        wait_until_ready(app)
+        lookup = measure_lookups(app, tscainv_keys)
+        upload = {str(size): measure_upload(app, tscainv_keys, size) for size in UPLOAD_SIZES}
+
+        report = {
+            'generatedAt': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'tscainvRecords': args.records,
+                'pmnaccRecords': app.loaded_record_counts().get('PMNACC', 0),
+                'lookupHits': LOOKUP_HITS,
+                'lookupMisses': LOOKUP_MISSES
+            },
+            'results': {
+                'startup': startup,
+                'lookup': lookup,
+                'upload': upload,
+                'peakRssMb': peak_rss_mb()
+            }
+        }
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
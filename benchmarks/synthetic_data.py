@@ -0,0 +1,97 @@
+# Synthetic databases for the benchmarks
+#
+# The real TSCA Inventory is only available from Google Drive, so the benchmarks
+# generate a file with the same columns, a similar size (~86,000 rows) and a
+# similar mix of flags, activities and duplicate CAS numbers. The generator is
+# seeded, so every run and every commit benchmarks the same data.
+
+import numpy as np
+import pandas as pd
+
+TSCAINV_RECORDS = 86000
+
+TSCAINV_COLUMNS = ['ID', 'CASRN', 'casregno', 'UID', 'EXP', 'ChemName', 'FLAG', 'ACTIVITY']
+
+FLAG_VALUES = ['', '', '', 'XU', 'S', 'PMN; S; 5E', 'TP', 'R', 'XU; S', 'PMN', '12C', 'FRI; XU', 'SP; S']
+ACTIVITY_VALUES = ['ACTIVE', 'ACTIVE', 'INACTIVE']
+NAME_WORDS = ['benzene', 'methyl', 'ethyl', 'chloride', 'acid', 'sodium', 'oxide', 'propanol', 'amine',
+              'polymer', 'ester', 'phenol', 'hydroxy', 'dimethyl', 'sulfonate', 'carbonate', 'nitrate',
+              'acrylate', 'glycol', 'siloxane', 'alcohols', 'fatty', 'reaction', 'products', 'with']
+
+# Share of rows repeating the CAS number of another row (the inventory lists some
+# substances more than once)
+DUPLICATE_SHARE = 0.02
+
+
+def cas_check_digits(bodies):
+    """Check digits for an int64 array of CAS numbers without their check digit"""
+    remaining = np.array(bodies, dtype=np.int64)
+    total = np.zeros_like(remaining)
+    position = 1
+    while remaining.any():
+        total += (remaining % 10) * position
+        remaining //= 10
+        position += 1
+    return total % 10
+
+
+def random_cas_keys(count, seed=0, exclude=None):
+    """count distinct, valid integer CAS keys (5 to 10 digits), none of them in exclude"""
+    rng = np.random.default_rng(seed)
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < count:
+        # Lengths are skewed towards the short numbers of common substances
+        digits = rng.choice(np.arange(4, 10), size=count * 2, p=[0.08, 0.2, 0.3, 0.22, 0.15, 0.05])
+        bodies = rng.integers(10 ** (digits - 1), 10 ** digits, dtype=np.int64)
+        candidates = bodies * 10 + cas_check_digits(bodies)
+        if exclude is not None:
+            candidates = candidates[~np.isin(candidates, exclude)]
+        keys = np.unique(np.concatenate([keys, candidates]))
+    return rng.permutation(keys)[:count]
+
+
+def dashed_cas(keys):
+    """Conventional dashed form of integer CAS keys, e.g. 7732185 -> '7732-18-5'"""
+    digits = pd.Series(keys).astype(str)
+    return digits.str[:-3] + '-' + digits.str[-3:-1] + '-' + digits.str[-1]
+
+
+def synthetic_tscainv(records=TSCAINV_RECORDS, seed=0):
+    """DataFrame shaped like the TSCA Inventory release"""
+    rng = np.random.default_rng(seed)
+    keys = random_cas_keys(records, seed)
+    duplicates = rng.random(records) < DUPLICATE_SHARE
+    keys[duplicates] = rng.choice(keys[~duplicates], size=int(duplicates.sum()))
+
+    words = rng.choice(NAME_WORDS, size=(records, 3))
+    names = pd.Series([' '.join(row) for row in words])
+    suffixed = rng.random(records) < 0.3
+    names[suffixed] = names[suffixed] + ', ' + pd.Series(rng.integers(1, 10, records)).astype(str)[suffixed] + '-'
+
+    return pd.DataFrame({
+        'ID': np.arange(1, records + 1),
+        'CASRN': dashed_cas(keys),
+        'casregno': keys,
+        'UID': '',
+        'EXP': '',
+        'ChemName': names,
+        'FLAG': rng.choice(FLAG_VALUES, size=records),
+        'ACTIVITY': rng.choice(ACTIVITY_VALUES, size=records)
+    }, columns=TSCAINV_COLUMNS)
+
+
+def write_tscainv(path, records=TSCAINV_RECORDS, seed=0):
+    """Write a synthetic TSCA Inventory CSV, returns its CAS keys"""
+    frame = synthetic_tscainv(records, seed)
+    frame.to_csv(path, index=False)
+    return frame['casregno'].to_numpy()
+
+
+def upload_text(hit_keys, count, hit_share=0.5, seed=0):
+    """Contents of a text upload with count distinct CAS numbers, hit_share of them in hit_keys"""
+    rng = np.random.default_rng(seed)
+    unique_hits = np.unique(hit_keys)
+    hits = rng.choice(unique_hits, size=min(int(count * hit_share), len(unique_hits)), replace=False)
+    misses = random_cas_keys(count - len(hits), seed + 1, exclude=unique_hits)
+    keys = rng.permutation(np.concatenate([hits, misses]))
+    return '\n'.join(dashed_cas(keys)) + '\n'
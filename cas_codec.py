@@ -0,0 +1,100 @@
+# Canonical CAS Registry Number handling
+#
+# A CAS number has 2-7 digits, then 2 digits, then a check digit, e.g. 7732-18-5.
+# The check digit is the sum of the other digits, each multiplied by its position
+# counted from the right, modulo 10 (8*1 + 1*2 + 2*3 + 3*4 + 7*5 + 7*6 = 105 -> 5).
+#
+# Lookups use the normalized digits as a 64-bit integer key (7732185): these are
+# smaller than strings, and faster to hash, sort and compare.
+
+import re
+import numpy as np
+import pandas as pd
+
+CAS_DIGITS_PATTERN = re.compile(r'^\d{5,10}$')
+
+MIN_CAS_KEY = 10000
+MAX_CAS_KEY = 9999999999
+
+MIN_CAS_DIGITS = len(str(MIN_CAS_KEY))
+MAX_CAS_DIGITS = len(str(MAX_CAS_KEY))
+
+
+def normalize_cas_number(cas_number):
+    """Remove dashes and spaces from CAS number"""
+    if pd.isna(cas_number):
+        return ""
+    return str(cas_number).replace('-', '').replace(' ', '')
+
+
+def normalize_cas_series(values):
+    """Vectorized normalize_cas_number for a whole column"""
+    return (values.fillna('').astype(str)
+            .str.replace('-', '', regex=False)
+            .str.replace(' ', '', regex=False))
+
+
+def encode_cas(cas_number):
+    """Integer key for a CAS-like number (5 to 10 digits once normalized), None otherwise
+
+    The check digit is not verified here, see is_valid_cas.
+    """
+    normalized = normalize_cas_number(cas_number)
+    if not CAS_DIGITS_PATTERN.match(normalized):
+        return None
+    return int(normalized)
+
+
+def encode_cas_series(values):
+    """Vectorized encode_cas: (int64 keys, mask of values that could be encoded)"""
+    normalized = normalize_cas_series(values)
+    encodable = normalized.str.match(CAS_DIGITS_PATTERN).to_numpy(dtype=bool)
+    keys = np.zeros(len(normalized), dtype=np.int64)
+    keys[encodable] = normalized[encodable].astype(np.int64).to_numpy()
+    return keys, encodable
+
+
+def cas_prefix_ranges(prefix):
+    """Half-open integer key ranges of all CAS keys whose digits start with prefix
+
+    Keys of each length form one range, e.g. "1102" -> [11020, 11030), [110200, 110300), ...
+    Ranges come in ascending key order. prefix must already be normalized.
+    """
+    if not prefix.isdigit() or prefix.startswith('0') or len(prefix) > MAX_CAS_DIGITS:
+        return []
+    value = int(prefix)
+    ranges = []
+    for length in range(max(len(prefix), MIN_CAS_DIGITS), MAX_CAS_DIGITS + 1):
+        scale = 10 ** (length - len(prefix))
+        ranges.append((value * scale, (value + 1) * scale))
+    return ranges
+
+
+def cas_check_digit(key):
+    """Expected check digit of an integer CAS key"""
+    body = str(key)[:-1]
+    return sum(position * int(digit) for position, digit in enumerate(reversed(body), start=1)) % 10
+
+
+def is_valid_cas(key):
+    """Whether an integer CAS key has the right length and check digit"""
+    return MIN_CAS_KEY <= key <= MAX_CAS_KEY and cas_check_digit(key) == key % 10
+
+
+def valid_cas_mask(keys):
+    """Vectorized is_valid_cas over an int64 array"""
+    keys = np.asarray(keys, dtype=np.int64)
+    remaining = keys // 10
+    total = np.zeros_like(keys)
+    position = 1
+    while remaining.any():
+        total += (remaining % 10) * position
+        remaining //= 10
+        position += 1
+    return (keys >= MIN_CAS_KEY) & (keys <= MAX_CAS_KEY) & (total % 10 == keys % 10)
+
+
+def format_cas(key):
+    """Conventional dashed form of an integer CAS key, e.g. 7732185 -> '7732-18-5'"""
+    digits = str(key)
+    return f"{digits[:-3]}-{digits[-3:-1]}-{digits[-1]}"
@@ -0,0 +1,53 @@
+# Changelog of database releases applied as deltas (see apply_delta in dataset.py)
+#
+# Every added, removed or changed row is appended as one JSON line:
+#   {"release": <dataset version>, "source": "TSCAINV", "appliedAt": ..., "change": "changed",
+#    "id": 123, "casKeys": [110203], "before": {...record...}, "after": {...record...}}
+#
+# casKeys holds the integer CAS keys of the record before and after the change, so
+# the history of a CAS number can be looked up even if the row's CAS was corrected.
+
+import os
+import json
+from datetime import datetime
+from cas_codec import encode_cas
+
+
+def append_changes(path, release, source, changes):
+    """Append the changes of one release of a database to the changelog"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    applied_at = datetime.now().isoformat()
+    with open(path, 'a', encoding='utf-8') as f:
+        for change in changes:
+            records = [record for record in (change['before'], change['after']) if record]
+            cas_keys = sorted({key for key in (encode_cas(record['casNumber']) for record in records)
+                               if key is not None})
+            entry = {'release': release, 'source': source, 'appliedAt': applied_at, 'casKeys': cas_keys}
+            entry.update(change)
+            f.write(json.dumps(entry) + '\n')
+
+
+def _entries(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def changes_for_cas(path, cas_key):
+    """Changelog entries of an integer CAS key, oldest release first"""
+    return [entry for entry in _entries(path) if cas_key in entry['casKeys']]
+
+
+def release_summaries(path):
+    """Number of added, removed and changed rows per release and database"""
+    summaries = {}
+    for entry in _entries(path):
+        key = (entry['release'], entry['source'])
+        if key not in summaries:
+            summaries[key] = {'release': entry['release'], 'source': entry['source'],
+                              'appliedAt': entry['appliedAt'], 'added': 0, 'removed': 0, 'changed': 0}
+        summaries[key][entry['change']] += 1
+    return list(summaries.values())
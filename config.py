@@ -36,4 +36,95 @@ GOOGLE_DRIVE_CONFIG = {
 LOCAL_FILES = {
     'tscainv': 'TSCAINV_012025.csv',
     'pmnacc': 'PMNACC_012025.csv'
-} 
\ No newline at end of file
+}
+
+# Databases compiled into the CAS lookup index, in the order search results are reported
+# Keys match GOOGLE_DRIVE_CONFIG and LOCAL_FILES: a database is downloaded from Google Drive
+# when it has an enabled file ID there, otherwise it is read from its local file. All enabled
+# databases are loaded concurrently. `header` is how the first line of a valid file starts.
+# cas_columns are searched; display_cas_columns are reported as casNumber/casRegNo.
+# Set check_digit to False for databases keyed by numbers without a CAS check digit.
+SOURCES_CONFIG = {
+    'pmnacc': {
+        'source': 'PMNACC',
+        'enabled': True,
+        'header': 'ID,PMNNO,ACCNO',
+        'cas_columns': ['ACCNO'],
+        'display_cas_columns': ['ACCNO'],
+        'name_column': 'GenericName',
+        'flag_column': 'FLAG',
+        'activity_column': 'ACTIVITY',
+        'id_column': 'ID',
+        # ACCNO holds accession numbers, which have no CAS check digit
+        'check_digit': False
+    },
+    'tscainv': {
+        'source': 'TSCAINV',
+        'enabled': True,
+        'header': 'ID,CASRN,casregno',
+        'cas_columns': ['casregno', 'CASRN'],
+        'display_cas_columns': ['CASRN', 'casregno'],
+        'name_column': 'ChemName',
+        'flag_column': 'FLAG',
+        'activity_column': 'ACTIVITY',
+        'id_column': 'ID'
+    }
+}
+
+# Local snapshot cache
+# Parsed databases are stored on disk so a restart can skip the Google Drive download
+# and CSV parse. Snapshots older than max_age_hours are re-checked against Drive.
+SNAPSHOT_CONFIG = {
+    'enabled': True,
+    'directory': 'data_cache',
+    'max_age_hours': 24
+}
+
+# Shared read-only dataset for gunicorn workers
+# When enabled, gunicorn.conf.py preloads the app so the master process loads the data once
+# and publishes it to `directory` as memory-mapped arrays. Every worker reads the same pages,
+# so memory use stays flat as workers are added. After a reload in one worker, the others
+# switch to the newly published version within poll_seconds.
+SHARED_DATA_CONFIG = {
+    'enabled': False,
+    'directory': 'data_cache/shared',
+    'poll_seconds': 5
+}
+
+# Background screening jobs (/api/jobs)
+# Uploaded files and annotated results are kept in `directory` for retention_hours.
+# Each job's CAS numbers are looked up in batches of batch_size on `workers` threads.
+JOB_CONFIG = {
+    'directory': 'data_cache/jobs',
+    'workers': 2,
+    'batch_size': 5000,
+    'retention_hours': 24
+}
+
+# Incremental database releases
+# When a reload finds databases that are already loaded, rows are matched by ID and only
+# added, removed and changed rows are applied. Every change is logged to `changelog`
+# (see /api/changelog).
+DELTA_CONFIG = {
+    'enabled': True,
+    'changelog': 'data_cache/changelog.ndjson'
+}
+
+# /api/search result cache
+# The serialized results of the `size` most recently searched CAS numbers are kept per
+# dataset version. Responses carry an ETag and may be cached by browsers and proxies
+# for max_age_seconds.
+SEARCH_CACHE_CONFIG = {
+    'size': 4096,
+    'max_age_seconds': 300
+}
+
+# Startup
+# With background set, workers accept requests at once and load the data on a background
+# thread; until it is ready, data routes answer 503 and /api/health reports the progress.
+# A failed load is retried every retry_seconds. In shared data mode the data is always
+# loaded before the workers start.
+STARTUP_CONFIG = {
+    'background': True,
+    'retry_seconds': 30
+}
@@ -0,0 +1,949 @@
+# Read-only, columnar form of the loaded databases
+#
+# load_data() parses every CSV into a pandas DataFrame and then compiles the
+# columns the service actually returns into plain numpy arrays:
+#   - CAS numbers are stored as integer keys, plus how each one is written
+#   - chemical names are interned: each distinct name is stored once, in one
+#     UTF-8 buffer, and rows hold its number
+#   - FLAG values are stored once per distinct combination, with its bitmask
+#     and description computed at load time (see flags.py)
+#   - the CAS lookup index is a pair of arrays sorted by integer CAS key
+#     (see cas_codec.py)
+#   - flag codes and ACTIVITY values have posting lists of the rows carrying
+#     them, for filter queries
+#   - chemical names are split into lower-case tokens; a sorted vocabulary plus
+#     token posting lists serve name search and prefix autocomplete
+#
+# A new release of a database can be applied as a delta (apply_delta): rows are
+# matched by ID, removed and changed rows are marked stale and dropped from the
+# indexes, and added or changed rows are appended. Stale rows stay in the
+# columns until the next full build.
+#
+# Because a Dataset is nothing but arrays it can be written to disk once and
+# memory-mapped read-only by every gunicorn worker, so resident memory does not
+# grow with the number of workers (see SHARED_DATA_CONFIG in config.py).
+#
+# Datasets are immutable: arrays are flagged read-only, lists are tuples and
+# attributes can't be reassigned, so any number of request threads can read one
+# without locks. Updates (apply_delta) build a new Dataset instead.
+
+import os
+import re
+import json
+import shutil
+from types import MappingProxyType
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from cas_codec import encode_cas_series, valid_cas_mask, cas_prefix_ranges, format_cas, is_valid_cas, MAX_CAS_DIGITS
+from flags import FLAG_BITS, flag_mask, get_flag_description
+
+# Result fields stored for every row, besides the source name
+RECORD_FIELDS = ['casNumber', 'chemicalName', 'flag', 'activity']
+
+META_FILE = 'meta.json'
+
+# Name tokens are runs of letters and digits, e.g. "2-Propanol, 1-chloro-" -> 2 propanol 1 chloro
+NAME_TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def tokenize_name(text):
+    """Lower-case search tokens of a chemical name or name query"""
+    return NAME_TOKEN_PATTERN.findall(text.lower())
+
+
+class ReadOnly:
+    """Base for dataset parts whose attributes and arrays can't change once built"""
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'{type(self).__name__} is read-only')
+        super().__setattr__(name, value)
+
+    def _freeze(self):
+        """Called at the end of __init__: flag every array attribute read-only, then lock attributes"""
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+        super().__setattr__('_frozen', True)
+
+
+def make_refs(source_id, rows):
+    """Pack a source number and row positions into int64 row references"""
+    return (np.int64(source_id) << 32) | rows.astype(np.int64)
+
+
+def split_ref(ref):
+    """Unpack a row reference into (source number, row position)"""
+    ref = int(ref)
+    return ref >> 32, ref & 0xFFFFFFFF
+
+
+class StringColumn(ReadOnly):
+    """Column of strings stored in one UTF-8 buffer plus an offsets array"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        self._freeze()
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def extended(self, values):
+        """New column with values appended"""
+        added = StringColumn.from_values(values)
+        return StringColumn(np.concatenate([self.offsets, self.offsets[-1] + added.offsets[1:]]),
+                            np.concatenate([self.data, added.data]))
+
+    def __getitem__(self, position):
+        start, stop = self.offsets[position], self.offsets[position + 1]
+        return self.data[start:stop].tobytes().decode('utf-8')
+
+    def lengths(self, rows):
+        """UTF-8 byte lengths of the values of rows"""
+        return self.offsets[rows + 1] - self.offsets[rows]
+
+    def arrays(self, prefix):
+        return {f'{prefix}.offsets': self.offsets, f'{prefix}.data': self.data}
+
+    def meta(self):
+        return {'type': 'string'}
+
+    @classmethod
+    def from_saved(cls, arrays, prefix, meta):
+        return cls(arrays[f'{prefix}.offsets'], arrays[f'{prefix}.data'])
+
+
+class InternedStringColumn(ReadOnly):
+    """Column of strings storing each distinct value once, rows hold its number
+
+    Repeated values (PMNACC generic names, inventory rows listed twice) cost a
+    4-byte code instead of another copy of the string.
+    """
+
+    def __init__(self, codes, strings):
+        self.codes = codes
+        self.strings = strings
+        self._freeze()
+
+    @classmethod
+    def from_values(cls, values):
+        codes, distinct = pd.factorize(pd.Series(values, dtype=object), sort=False)
+        return cls(codes.astype(np.int32), StringColumn.from_values(distinct.tolist()))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def extended(self, values):
+        """New column with values appended, new distinct values go to the end of the buffer"""
+        positions = {self.strings[code]: code for code in range(len(self.strings))}
+        added = []
+        codes = np.empty(len(values), dtype=np.int32)
+        for position, value in enumerate(values):
+            if value not in positions:
+                positions[value] = len(positions)
+                added.append(value)
+            codes[position] = positions[value]
+        return InternedStringColumn(np.concatenate([self.codes, codes]), self.strings.extended(added))
+
+    def __getitem__(self, position):
+        return self.strings[self.codes[position]]
+
+    def lengths(self, rows):
+        """UTF-8 byte lengths of the values of rows"""
+        return self.strings.lengths(self.codes[rows])
+
+    def arrays(self, prefix):
+        arrays = {f'{prefix}.codes': self.codes}
+        arrays.update(self.strings.arrays(f'{prefix}.strings'))
+        return arrays
+
+    def meta(self):
+        return {'type': 'interned'}
+
+    @classmethod
+    def from_saved(cls, arrays, prefix, meta):
+        return cls(arrays[f'{prefix}.codes'], StringColumn.from_saved(arrays, f'{prefix}.strings', None))
+
+
+class CasColumn(ReadOnly):
+    """Column of CAS numbers stored as integer keys plus how each one is written
+
+    Nearly every value is the dashed (7732-18-5) or plain (7732185) form of its key,
+    or empty, which costs 9 bytes a row. Values written any other way are kept as
+    strings, with their row positions.
+    """
+
+    DASHED, DIGITS, EMPTY, OTHER = 0, 1, 2, 3
+
+    def __init__(self, keys, styles, other_rows, other_values):
+        self.keys = keys
+        self.styles = styles
+        self.other_rows = other_rows
+        self.other_values = other_values
+        self._freeze()
+
+    @classmethod
+    def from_values(cls, values):
+        keys = [0] * len(values)
+        styles = [cls.OTHER] * len(values)
+        for row, text in enumerate(values):
+            if not text:
+                styles[row] = cls.EMPTY
+                continue
+            digits = text.replace('-', '')
+            if not (digits.isdecimal() and len(digits) <= MAX_CAS_DIGITS):
+                continue
+            # Only values that the key renders back to exactly are stored as keys
+            key = int(digits)
+            if text == format_cas(key):
+                keys[row], styles[row] = key, cls.DASHED
+            elif text == str(key):
+                keys[row], styles[row] = key, cls.DIGITS
+        keys = np.array(keys, dtype=np.int64)
+        styles = np.array(styles, dtype=np.int8)
+
+        other_rows = np.flatnonzero(styles == cls.OTHER).astype(np.int64)
+        return cls(keys, styles, other_rows, StringColumn.from_values([values[row] for row in other_rows]))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def extended(self, values):
+        """New column with values appended"""
+        added = CasColumn.from_values(values)
+        return CasColumn(np.concatenate([self.keys, added.keys]),
+                         np.concatenate([self.styles, added.styles]),
+                         np.concatenate([self.other_rows, len(self) + added.other_rows]),
+                         self.other_values.extended([values[row] for row in added.other_rows]))
+
+    def __getitem__(self, position):
+        style = int(self.styles[position])
+        if style == self.DASHED:
+            return format_cas(int(self.keys[position]))
+        if style == self.DIGITS:
+            return str(int(self.keys[position]))
+        if style == self.EMPTY:
+            return ''
+        return self.other_values[int(np.searchsorted(self.other_rows, position))]
+
+    def arrays(self, prefix):
+        arrays = {f'{prefix}.keys': self.keys, f'{prefix}.styles': self.styles,
+                  f'{prefix}.other_rows': self.other_rows}
+        arrays.update(self.other_values.arrays(f'{prefix}.other'))
+        return arrays
+
+    def meta(self):
+        return {'type': 'cas'}
+
+    @classmethod
+    def from_saved(cls, arrays, prefix, meta):
+        return cls(arrays[f'{prefix}.keys'], arrays[f'{prefix}.styles'], arrays[f'{prefix}.other_rows'],
+                   StringColumn.from_saved(arrays, f'{prefix}.other', None))
+
+
+class CategoryColumn(ReadOnly):
+    """Column of repeated strings stored as codes into a list of distinct values"""
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = tuple(categories)
+        self._freeze()
+
+    @classmethod
+    def from_values(cls, values):
+        categories, codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+        return cls(codes.astype(np.int32), categories.tolist())
+
+    def __len__(self):
+        return len(self.codes)
+
+    def extended(self, values):
+        """New column with values appended, new distinct values go to the end of categories"""
+        categories = list(self.categories)
+        positions = {value: code for code, value in enumerate(categories)}
+        codes = np.empty(len(values), dtype=np.int32)
+        for position, value in enumerate(values):
+            if value not in positions:
+                positions[value] = len(categories)
+                categories.append(value)
+            codes[position] = positions[value]
+        return CategoryColumn(np.concatenate([self.codes, codes]), categories)
+
+    def __getitem__(self, position):
+        return self.categories[self.codes[position]]
+
+    def arrays(self, prefix):
+        return {f'{prefix}.codes': self.codes}
+
+    def meta(self):
+        return {'type': 'category', 'categories': self.categories}
+
+    @classmethod
+    def from_saved(cls, arrays, prefix, meta):
+        return cls(arrays[f'{prefix}.codes'], meta['categories'])
+
+
+COLUMN_TYPES = {'string': StringColumn, 'interned': InternedStringColumn, 'cas': CasColumn,
+                'category': CategoryColumn}
+
+# How each result field is stored: FLAG and ACTIVITY have few distinct values
+FIELD_COLUMN_TYPES = {'casNumber': CasColumn, 'chemicalName': InternedStringColumn,
+                      'flag': CategoryColumn, 'activity': CategoryColumn}
+
+
+class KeyIndex(ReadOnly):
+    """Sorted (key, row reference) pairs searched by binary search"""
+
+    def __init__(self, keys, refs):
+        self.keys = keys
+        self.refs = refs
+        self._freeze()
+
+    @classmethod
+    def build(cls, keys, refs):
+        # Sort by key, then by reference, so matches come back in source and row order.
+        # Repeated pairs (a row whose columns normalize to the same CAS) are dropped.
+        order = np.lexsort((refs, keys))
+        keys, refs = keys[order], refs[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (refs[1:] != refs[:-1])
+        return cls(keys[distinct], refs[distinct])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def updated(self, drop_refs, add_keys, add_refs):
+        """New index without the entries of drop_refs (sorted) and with the added entries
+
+        Costs one pass over the index arrays plus a binary search per added entry,
+        instead of sorting everything again.
+        """
+        keep = ~np.isin(self.refs, drop_refs, assume_unique=False) if len(drop_refs) else slice(None)
+        keys, refs = self.keys[keep], self.refs[keep]
+        if len(add_keys) == 0:
+            return KeyIndex(keys, refs)
+
+        added = KeyIndex.build(add_keys, add_refs)
+        positions = np.empty(len(added), dtype=np.int64)
+        starts = np.searchsorted(keys, added.keys, side='left')
+        stops = np.searchsorted(keys, added.keys, side='right')
+        for position, (start, stop, ref) in enumerate(zip(starts, stops, added.refs)):
+            positions[position] = start + np.searchsorted(refs[start:stop], ref)
+        return KeyIndex(np.insert(keys, positions, added.keys), np.insert(refs, positions, added.refs))
+
+    def find(self, key):
+        """Sorted row references stored under a key"""
+        start = np.searchsorted(self.keys, key, side='left')
+        stop = np.searchsorted(self.keys, key, side='right')
+        return self.refs[start:stop]
+
+    def arrays(self, prefix):
+        return {f'{prefix}.keys': self.keys, f'{prefix}.refs': self.refs}
+
+    @classmethod
+    def from_saved(cls, arrays, prefix):
+        return cls(arrays[f'{prefix}.keys'], arrays[f'{prefix}.refs'])
+
+
+class SourceTable(ReadOnly):
+    """Result columns of one database"""
+
+    def __init__(self, name, columns, flag_masks, flag_descriptions, ids, row_hashes, live, check_digit=True,
+                 key_range=None):
+        self.name = name
+        self.columns = MappingProxyType(dict(columns))
+        # Bitmask of known flag codes per row, and the description of every distinct FLAG value
+        self.flag_masks = flag_masks
+        self.flag_descriptions = tuple(flag_descriptions)
+        # Per row: database ID, hash of the used columns (to spot changed rows between
+        # releases), and False once a later release removed or replaced the row
+        self.ids = ids
+        self.row_hashes = row_hashes
+        self.live = live
+        # False for databases keyed by numbers without a CAS check digit (PMNACC accession numbers)
+        self.check_digit = check_digit
+        # (lowest, highest) CAS index key of the database, None if it has no keys
+        self.key_range = tuple(key_range) if key_range is not None else None
+        self._freeze()
+
+    @classmethod
+    def build(cls, name, values, ids, row_hashes, check_digit=True, cas_keys=()):
+        """Build from a list of strings per RECORD_FIELDS field and the CAS index keys of the rows"""
+        columns = {field: FIELD_COLUMN_TYPES[field].from_values(values[field]) for field in RECORD_FIELDS}
+
+        # FLAG strings are parsed once per distinct combination instead of once per result
+        flags = columns['flag']
+        category_masks = np.array([flag_mask(flag) for flag in flags.categories], dtype=np.uint32)
+        flag_descriptions = [get_flag_description(flag) for flag in flags.categories]
+
+        return cls(name, columns, category_masks[flags.codes], flag_descriptions,
+                   ids, row_hashes, np.ones(len(ids), dtype=bool), check_digit, _key_range(cas_keys))
+
+    def updated(self, stale_rows, values, ids, row_hashes, cas_keys=()):
+        """New table with stale_rows marked stale and the rows in values (with CAS index keys cas_keys) appended"""
+        columns = {field: column.extended(values[field]) for field, column in self.columns.items()}
+
+        flags = columns['flag']
+        flag_descriptions = list(self.flag_descriptions)
+        flag_descriptions.extend(get_flag_description(flag) for flag in flags.categories[len(flag_descriptions):])
+        added_masks = np.array([flag_mask(flag) for flag in values['flag']], dtype=np.uint32)
+
+        live = np.concatenate([self.live, np.ones(len(ids), dtype=bool)])
+        live[stale_rows] = False
+
+        return SourceTable(self.name, columns,
+                           np.concatenate([self.flag_masks, added_masks]),
+                           flag_descriptions,
+                           np.concatenate([self.ids, ids]),
+                           np.concatenate([self.row_hashes, row_hashes]),
+                           live,
+                           self.check_digit,
+                           _key_range(cas_keys, self.key_range))
+
+    def __len__(self):
+        return len(self.columns[RECORD_FIELDS[0]])
+
+    def accepts_unchecked_key(self, cas_key):
+        """Whether a key failing the CAS check digit can match: only in a database without
+        check digits, and only within its key range"""
+        if self.check_digit or self.key_range is None:
+            return False
+        return self.key_range[0] <= cas_key <= self.key_range[1]
+
+    def live_count(self):
+        """Number of rows of the current release"""
+        return int(np.count_nonzero(self.live))
+
+    def record(self, row):
+        """Result dict for a row"""
+        record = {'source': self.name}
+        for field in RECORD_FIELDS:
+            record[field] = self.columns[field][row]
+        record['flagDescription'] = self.flag_descriptions[self.columns['flag'].codes[row]]
+        return record
+
+    def arrays(self, prefix):
+        arrays = {f'{prefix}.flag_masks': self.flag_masks,
+                  f'{prefix}.ids': self.ids,
+                  f'{prefix}.row_hashes': self.row_hashes,
+                  f'{prefix}.live': self.live}
+        for field, column in self.columns.items():
+            arrays.update(column.arrays(f'{prefix}.{field}'))
+        return arrays
+
+    def meta(self):
+        return {
+            'name': self.name,
+            'records': len(self),
+            'check_digit': self.check_digit,
+            'key_range': list(self.key_range) if self.key_range is not None else None,
+            'columns': {field: column.meta() for field, column in self.columns.items()},
+            'flag_descriptions': self.flag_descriptions
+        }
+
+    @classmethod
+    def from_saved(cls, arrays, prefix, meta):
+        columns = {field: COLUMN_TYPES[column_meta['type']].from_saved(arrays, f'{prefix}.{field}', column_meta)
+                   for field, column_meta in meta['columns'].items()}
+        return cls(meta['name'], columns, arrays[f'{prefix}.flag_masks'], meta['flag_descriptions'],
+                   arrays[f'{prefix}.ids'], arrays[f'{prefix}.row_hashes'], arrays[f'{prefix}.live'],
+                   meta['check_digit'], meta.get('key_range'))
+
+
+class Dataset(ReadOnly):
+    """All loaded databases plus their lookup indexes"""
+
+    def __init__(self, sources, cas_index, flag_index, activity_index, activity_values,
+                 name_vocabulary, name_index, version, directory=None):
+        self.sources = tuple(sources)
+        self.cas_index = cas_index
+        # Posting lists: flag bit -> rows carrying the flag, activity number -> rows with that ACTIVITY
+        self.flag_index = flag_index
+        self.activity_index = activity_index
+        self.activity_values = tuple(activity_values)
+        # Sorted distinct name tokens, and token number -> rows whose name contains the token
+        self.name_vocabulary = name_vocabulary
+        self.name_index = name_index
+        self.version = version
+        # Set when the arrays are memory-mapped from a published directory
+        self.directory = directory
+        self._freeze()
+
+    def accepts_key(self, cas_key):
+        """Whether an integer CAS key is worth looking up: a valid CAS number, or a key without
+        a valid check digit in the key range of a database that doesn't use check digits"""
+        return is_valid_cas(cas_key) or any(source.accepts_unchecked_key(cas_key) for source in self.sources)
+
+    def find(self, cas_key):
+        """(SourceTable, row) pairs matching an integer CAS key"""
+        return self.find_many([cas_key])[0]
+
+    def find_many(self, cas_keys):
+        """Matches for many integer CAS keys with one vectorized index pass
+
+        Returns one list of (SourceTable, row) pairs per key, in input order.
+        Keys with a wrong check digit only match databases that don't use one.
+        """
+        keys = np.asarray(cas_keys, dtype=np.int64)
+        starts = np.searchsorted(self.cas_index.keys, keys, side='left')
+        stops = np.searchsorted(self.cas_index.keys, keys, side='right')
+        valid = valid_cas_mask(keys)
+
+        matches = [[] for _ in range(len(keys))]
+        for position in np.flatnonzero(stops > starts):
+            for ref in self.cas_index.refs[starts[position]:stops[position]]:
+                source_id, row = split_ref(ref)
+                source = self.sources[source_id]
+                if valid[position] or not source.check_digit:
+                    matches[position].append((source, row))
+        return matches
+
+    def records(self, cas_key):
+        """Result dicts for an integer CAS key, in source and row order"""
+        return [source.record(row) for source, row in self.find(cas_key)]
+
+    def records_many(self, cas_keys):
+        """Result dicts for many integer CAS keys, one list per key"""
+        return [[source.record(row) for source, row in matches]
+                for matches in self.find_many(cas_keys)]
+
+    def find_prefix(self, prefix):
+        """Row references of CAS keys starting with the normalized digits prefix, in key order"""
+        keys = self.cas_index.keys
+        slices = []
+        for low, high in cas_prefix_ranges(prefix):
+            start = np.searchsorted(keys, low, side='left')
+            stop = np.searchsorted(keys, high, side='left')
+            if stop > start:
+                slices.append(self.cas_index.refs[start:stop])
+        return np.concatenate(slices) if slices else np.array([], dtype=np.int64)
+
+    def query(self, flag_bits=(), match_all=False, activity=None, source_names=None):
+        """Sorted row references of rows matching flag and ACTIVITY filters
+
+        flag_bits are combined with OR (or AND when match_all is set), then
+        intersected with the rows having the given ACTIVITY value (if any) and
+        restricted to the named databases (if given). At least one of flag_bits
+        and activity must be given.
+        """
+        postings = None
+        if flag_bits:
+            lists = [self.flag_index.find(bit) for bit in flag_bits]
+            if match_all:
+                postings = lists[0]
+                for refs in lists[1:]:
+                    postings = np.intersect1d(postings, refs, assume_unique=True)
+            else:
+                postings = np.unique(np.concatenate(lists))
+
+        if activity is not None:
+            activity_refs = np.array([], dtype=np.int64)
+            if activity in self.activity_values:
+                activity_refs = self.activity_index.find(self.activity_values.index(activity))
+            postings = activity_refs if postings is None else np.intersect1d(postings, activity_refs,
+                                                                             assume_unique=True)
+
+        if source_names is not None:
+            # References are ordered by source, so each source is one contiguous slice
+            parts = []
+            for source_id, source in enumerate(self.sources):
+                if source.name in source_names:
+                    start = np.searchsorted(postings, source_id << 32)
+                    stop = np.searchsorted(postings, (source_id + 1) << 32)
+                    parts.append(postings[start:stop])
+            postings = np.concatenate(parts) if parts else postings[:0]
+
+        return postings
+
+    def _name_token_refs(self, token, prefix):
+        """Sorted row references of names containing a token, or any token starting with it"""
+        first = np.searchsorted(self.name_vocabulary, token, side='left')
+        last = np.searchsorted(self.name_vocabulary, token + '\uffff' if prefix else token, side='right')
+        # Token numbers follow vocabulary order, so a prefix covers one contiguous key range
+        start = np.searchsorted(self.name_index.keys, first, side='left')
+        stop = np.searchsorted(self.name_index.keys, last, side='left')
+        refs = self.name_index.refs[start:stop]
+        return np.unique(refs) if last - first > 1 else refs
+
+    def search_names(self, text, prefix=False):
+        """Sorted row references of names containing every token of text
+
+        With prefix set, each query token only has to start a name token,
+        which is what typeahead needs ("benz chlor" finds "Benzyl chloride").
+        """
+        tokens = tokenize_name(text)
+        if not tokens:
+            return np.array([], dtype=np.int64)
+
+        refs = None
+        for token in tokens:
+            token_refs = self._name_token_refs(token, prefix)
+            refs = token_refs if refs is None else np.intersect1d(refs, token_refs, assume_unique=True)
+            if len(refs) == 0:
+                break
+        return refs
+
+    def shortest_names(self, refs, limit):
+        """The limit row references with the shortest chemical names, shortest first"""
+        lengths = np.empty(len(refs), dtype=np.int64)
+        for source_id, source in enumerate(self.sources):
+            start = np.searchsorted(refs, source_id << 32)
+            stop = np.searchsorted(refs, (source_id + 1) << 32)
+            rows = refs[start:stop] & 0xFFFFFFFF
+            lengths[start:stop] = source.columns['chemicalName'].lengths(rows)
+
+        if len(refs) > limit:
+            candidates = np.argpartition(lengths, limit)[:limit]
+        else:
+            candidates = np.arange(len(refs))
+        order = candidates[np.lexsort((refs[candidates], lengths[candidates]))]
+        return refs[order]
+
+    def records_for_refs(self, refs):
+        """Result dicts for row references"""
+        records = []
+        for ref in refs:
+            source_id, row = split_ref(ref)
+            records.append(self.sources[source_id].record(row))
+        return records
+
+    def record_counts(self):
+        return {source.name: source.live_count() for source in self.sources}
+
+    def memory_usage(self):
+        """Bytes of array data per source (by column) and per index"""
+        sources = {}
+        for source in self.sources:
+            usage = {}
+            for name, array in source.arrays('').items():
+                part = name.split('.')[1]
+                usage[part] = usage.get(part, 0) + array.nbytes
+            usage['total'] = sum(usage.values())
+            sources[source.name] = usage
+
+        indexes = {name: index.keys.nbytes + index.refs.nbytes
+                   for name, index in (('cas', self.cas_index), ('flag', self.flag_index),
+                                       ('activity', self.activity_index), ('name', self.name_index))}
+        indexes['nameVocabulary'] = self.name_vocabulary.nbytes
+        indexes['total'] = sum(indexes.values())
+
+        return {'sources': sources, 'indexes': indexes,
+                'total': sum(usage['total'] for usage in sources.values()) + indexes['total']}
+
+    def arrays(self):
+        arrays = self.cas_index.arrays('cas_index')
+        arrays.update(self.flag_index.arrays('flag_index'))
+        arrays.update(self.activity_index.arrays('activity_index'))
+        arrays.update(self.name_index.arrays('name_index'))
+        arrays['name_vocabulary'] = self.name_vocabulary
+        for source_id, source in enumerate(self.sources):
+            arrays.update(source.arrays(f'source{source_id}'))
+        return arrays
+
+    def save(self, directory):
+        """Write every array as .npy plus a JSON description"""
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self.arrays().items():
+            np.save(os.path.join(directory, f'{name}.npy'), array)
+
+        meta = {
+            'version': self.version,
+            'saved_at': datetime.now().isoformat(),
+            'activity_values': self.activity_values,
+            'sources': [source.meta() for source in self.sources]
+        }
+        with open(os.path.join(directory, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a saved dataset, memory-mapping its arrays read-only by default"""
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+
+        arrays = {}
+        for file_name in os.listdir(directory):
+            if file_name.endswith('.npy'):
+                arrays[file_name[:-4]] = np.load(os.path.join(directory, file_name),
+                                                 mmap_mode='r' if mmap else None)
+
+        sources = [SourceTable.from_saved(arrays, f'source{source_id}', source_meta)
+                   for source_id, source_meta in enumerate(meta['sources'])]
+
+        return cls(sources,
+                   KeyIndex.from_saved(arrays, 'cas_index'),
+                   KeyIndex.from_saved(arrays, 'flag_index'),
+                   KeyIndex.from_saved(arrays, 'activity_index'),
+                   meta['activity_values'],
+                   arrays['name_vocabulary'],
+                   KeyIndex.from_saved(arrays, 'name_index'),
+                   meta['version'],
+                   directory=directory if mmap else None)
+
+
+def _display_strings(data, columns):
+    """First non-empty value of the given columns as a string, '' if all are empty"""
+    result = pd.Series('', index=data.index, dtype=object)
+    for column in reversed(columns):
+        values = data[column]
+        result = result.where(values.isna(), values.astype(str))
+    return result.tolist()
+
+
+def build_dataset(frames, source_columns):
+    """Compile (source name, DataFrame) pairs into a Dataset
+
+    frames must be in result order: matches are reported source by source.
+    source_columns maps each source name to the DataFrame columns it uses.
+    """
+    sources = []
+    cas_keys, cas_refs = [], []
+    name_tokens, name_refs = [], []
+
+    for source_id, (name, data) in enumerate(frames):
+        spec = source_columns[name]
+        values = _record_values(data, spec)
+        ids, row_hashes = _row_identity(data, spec)
+        keys, refs = _cas_entries(source_id, data, spec)
+        sources.append(SourceTable.build(name, values, ids, row_hashes, spec.get('check_digit', True), keys))
+
+        cas_keys.append(keys)
+        cas_refs.append(refs)
+        tokens, refs = _name_entries(source_id, values['chemicalName'])
+        name_tokens.append(tokens)
+        name_refs.append(refs)
+
+    # Posting lists for filter queries. ACTIVITY values are numbered across all sources.
+    activity_values = sorted({value for source in sources for value in source.columns['activity'].categories})
+    flag_keys, flag_refs, activity_keys, activity_refs = [], [], [], []
+    for source_id, source in enumerate(sources):
+        keys, refs = _flag_entries(source_id, source.flag_masks)
+        flag_keys.append(keys)
+        flag_refs.append(refs)
+        keys, refs = _activity_entries(source_id, source.columns['activity'].codes,
+                                       source.columns['activity'].categories, activity_values)
+        activity_keys.append(keys)
+        activity_refs.append(refs)
+
+    # Only the distinct tokens are sorted, and token occurrences stay in one array per
+    # source: fixed-width string arrays are as wide as their longest token, so joining
+    # all sources would size every token like the longest name in any database
+    distinct_tokens = [pd.unique(tokens) for tokens in name_tokens]
+    name_vocabulary = (np.unique(np.concatenate(distinct_tokens)).astype(str) if distinct_tokens
+                       else np.array([], dtype=str))
+    name_keys = [np.searchsorted(name_vocabulary, tokens).astype(np.int64) for tokens in name_tokens]
+
+    return Dataset(sources,
+                   _build_index(cas_keys, cas_refs),
+                   _build_index(flag_keys, flag_refs),
+                   _build_index(activity_keys, activity_refs),
+                   activity_values,
+                   name_vocabulary,
+                   # KeyIndex.build drops repeated (token, row) pairs of names using a word twice
+                   _build_index(name_keys, name_refs),
+                   _new_version())
+
+
+def apply_delta(data, name, frame, spec):
+    """Apply a new release of one database to a dataset
+
+    Rows of frame are matched to the loaded rows by ID. Returns the updated
+    Dataset (data itself if nothing changed) and the list of changes, each a
+    dict with 'change' ('added', 'removed' or 'changed'), 'id', 'before' and
+    'after' records. Raises ValueError if the release can't be matched by ID.
+    """
+    if 'id_column' not in spec:
+        raise ValueError(f'{name} has no ID column, a full rebuild is needed')
+    source_id = [source.name for source in data.sources].index(name)
+    source = data.sources[source_id]
+    new_ids, new_hashes = _row_identity(frame, spec)
+    if len(np.unique(new_ids)) != len(new_ids):
+        raise ValueError(f'{name} IDs are not unique, a full rebuild is needed')
+
+    # Match current rows to the release by ID
+    live_rows = np.flatnonzero(source.live)
+    live_ids = source.ids[live_rows]
+    _, live_positions, new_positions = np.intersect1d(live_ids, new_ids, assume_unique=True, return_indices=True)
+    modified = source.row_hashes[live_rows[live_positions]] != new_hashes[new_positions]
+
+    removed_rows = np.setdiff1d(live_rows, live_rows[live_positions], assume_unique=True)
+    changed_rows = live_rows[live_positions[modified]]
+    added_positions = np.setdiff1d(np.arange(len(frame)), new_positions, assume_unique=True)
+    appended_positions = np.sort(np.concatenate([added_positions, new_positions[modified]]))
+    if len(removed_rows) == 0 and len(appended_positions) == 0:
+        return data, []
+
+    appended = frame.iloc[appended_positions]
+    values = _record_values(appended, spec)
+    first_row = len(source)
+    cas_keys, cas_refs = _cas_entries(source_id, appended, spec, first_row)
+    updated_source = source.updated(np.concatenate([removed_rows, changed_rows]), values,
+                                    new_ids[appended_positions], new_hashes[appended_positions], cas_keys)
+    stale_refs = np.sort(make_refs(source_id, np.concatenate([removed_rows, changed_rows])))
+
+    # Flag and activity entries of the appended rows
+    flag_keys, flag_refs = _flag_entries(source_id, updated_source.flag_masks[first_row:], first_row)
+    activity = updated_source.columns['activity']
+    activity_values = list(data.activity_values)
+    activity_values.extend(value for value in activity.categories if value not in activity_values)
+    activity_keys, activity_refs = _activity_entries(source_id, activity.codes[first_row:], activity.categories,
+                                                     activity_values, first_row)
+
+    # New name tokens are merged into the vocabulary. The renumbering keeps the order
+    # of existing tokens, so the name index only needs its keys mapped.
+    tokens, name_refs = _name_entries(source_id, values['chemicalName'], first_row)
+    name_vocabulary = np.union1d(data.name_vocabulary, tokens)
+    name_index = data.name_index
+    if len(name_vocabulary) != len(data.name_vocabulary):
+        renumbered = np.searchsorted(name_vocabulary, data.name_vocabulary).astype(np.int64)
+        name_index = KeyIndex(renumbered[name_index.keys], name_index.refs)
+    name_keys = np.searchsorted(name_vocabulary, tokens).astype(np.int64)
+
+    sources = list(data.sources)
+    sources[source_id] = updated_source
+    updated = Dataset(sources,
+                      data.cas_index.updated(stale_refs, cas_keys, cas_refs),
+                      data.flag_index.updated(stale_refs, flag_keys, flag_refs),
+                      data.activity_index.updated(stale_refs, activity_keys, activity_refs),
+                      activity_values,
+                      name_vocabulary,
+                      name_index.updated(stale_refs, name_keys, name_refs),
+                      _new_version())
+
+    # Describe the changes, with the records before and after the release
+    changes = []
+    appended_rows = {int(position): first_row + offset for offset, position in enumerate(appended_positions)}
+    for row in removed_rows:
+        changes.append({'change': 'removed', 'id': int(source.ids[row]), 'before': source.record(row), 'after': None})
+    for row, position in zip(changed_rows, new_positions[modified]):
+        changes.append({'change': 'changed', 'id': int(source.ids[row]), 'before': source.record(row),
+                        'after': updated_source.record(appended_rows[int(position)])})
+    for position in added_positions:
+        changes.append({'change': 'added', 'id': int(new_ids[position]), 'before': None,
+                        'after': updated_source.record(appended_rows[int(position)])})
+    return updated, changes
+
+
+def _key_range(keys, current=None):
+    """(lowest, highest) of integer keys and of the range current, None if there are none"""
+    bounds = [int(key) for key in (np.min(keys), np.max(keys))] if len(keys) else []
+    if current is not None:
+        bounds.extend(current)
+    return (min(bounds), max(bounds)) if bounds else None
+
+
+def _new_version():
+    return datetime.now().strftime('%Y%m%d%H%M%S%f')
+
+
+def _record_values(data, spec):
+    """Result strings per RECORD_FIELDS field for the rows of a DataFrame"""
+    return {
+        'casNumber': _display_strings(data, spec['display_cas_columns']),
+        'chemicalName': _display_strings(data, [spec['name_column']]),
+        'flag': _display_strings(data, [spec['flag_column']]),
+        'activity': _display_strings(data, [spec['activity_column']])
+    }
+
+
+def _row_identity(data, spec):
+    """(ID, row hash) arrays for the rows of a DataFrame
+
+    The hash covers the columns a row contributes to the dataset. Numeric columns
+    are hashed as floats, so a column that is read as integers in one release and
+    as floats (because of a blank) in the next doesn't make every row look
+    changed. Row positions stand in for IDs when the database has no ID column.
+    """
+    if 'id_column' in spec:
+        ids = pd.to_numeric(data[spec['id_column']], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    else:
+        ids = np.arange(len(data), dtype=np.int64)
+    columns = dict.fromkeys(spec['cas_columns'] + spec['display_cas_columns'] +
+                            [spec['name_column'], spec['flag_column'], spec['activity_column']])
+    contents = {}
+    for column in columns:
+        column_values = data[column]
+        if pd.api.types.is_numeric_dtype(column_values):
+            column_values = column_values.astype(np.float64)
+        contents[column] = column_values.to_numpy()
+    row_hashes = pd.util.hash_pandas_object(pd.DataFrame(contents), index=False).to_numpy(dtype=np.uint64)
+    return ids, row_hashes
+
+
+def _cas_entries(source_id, data, spec, first_row=0):
+    """CAS index (keys, refs) of the rows of a DataFrame stored from row first_row on"""
+    keys, refs = [], []
+    for column in spec['cas_columns']:
+        column_keys, encodable = encode_cas_series(data[column])
+        keys.append(column_keys[encodable])
+        refs.append(make_refs(source_id, first_row + np.flatnonzero(encodable)))
+    return np.concatenate(keys), np.concatenate(refs)
+
+
+def _flag_entries(source_id, flag_masks, first_row=0):
+    """Flag posting list (bit, refs) entries of rows with the given flag bitmasks"""
+    keys, refs = [], []
+    for bit in range(len(FLAG_BITS)):
+        rows = np.flatnonzero(flag_masks & np.uint32(1 << bit))
+        keys.append(np.full(len(rows), bit, dtype=np.int64))
+        refs.append(make_refs(source_id, first_row + rows))
+    return np.concatenate(keys), np.concatenate(refs)
+
+
+def _activity_entries(source_id, codes, categories, activity_values, first_row=0):
+    """ACTIVITY posting list (value number, refs) entries of rows with the given category codes"""
+    numbers = np.array([activity_values.index(value) for value in categories], dtype=np.int64)
+    return numbers[codes], make_refs(source_id, first_row + np.arange(len(codes)))
+
+
+def _name_entries(source_id, names, first_row=0):
+    """(token, refs) entries of chemical names, one per token occurrence"""
+    row_tokens = (pd.Series(names, dtype=object).str.lower()
+                  .str.findall(NAME_TOKEN_PATTERN).explode().dropna())
+    tokens = row_tokens.to_numpy(dtype=str) if len(row_tokens) else np.array([], dtype=str)
+    return tokens, make_refs(source_id, first_row + row_tokens.index.to_numpy(dtype=np.int64))
+
+
+def _build_index(keys, refs):
+    """KeyIndex from lists of key and reference arrays"""
+    if not keys:
+        return KeyIndex(np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    return KeyIndex.build(np.concatenate(keys), np.concatenate(refs))
+
+
+def publish_dataset(data, directory):
+    """Save a dataset under directory/<version> and return it memory-mapped
+
+    Directories of older versions are removed. Processes that still have them
+    mapped keep working because the files stay alive until they are unmapped.
+    """
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, data.version)
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    data.save(staging)
+    os.rename(staging, target)
+
+    for entry in os.listdir(directory):
+        if entry != data.version:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+    return Dataset.load(target, mmap=True)
+
+
+def latest_version(directory):
+    """Version of the newest dataset published under directory, None if there is none"""
+    if not os.path.isdir(directory):
+        return None
+    versions = [entry for entry in os.listdir(directory)
+                if not entry.endswith('.tmp') and os.path.exists(os.path.join(directory, entry, META_FILE))]
+    return max(versions) if versions else None
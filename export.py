@@ -0,0 +1,58 @@
+# Streamed export of annotated search results (/api/export)
+#
+# Rows come from a generator (see jobs.annotated_rows) and are written out as they
+# arrive, so memory use doesn't grow with the number of results:
+#   CSV   encoded in chunks of about CHUNK_SIZE characters and streamed to the client
+#   XLSX  written row by row with openpyxl's write-only workbook (which keeps rows in
+#         a temporary file, not in memory) and sent once complete. openpyxl is an
+#         optional dependency; without it only CSV is available.
+
+import io
+import csv
+
+from jobs import ANNOTATED_COLUMNS
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def xlsx_available():
+    """Whether XLSX export is possible (openpyxl is installed)"""
+    return Workbook is not None
+
+
+def csv_chunks(rows):
+    """Yield an annotated CSV (header first) for rows, in chunks of about CHUNK_SIZE characters
+
+    An error while rows are produced can't change the response status any more, so
+    it ends the file with an 'error' row instead.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=ANNOTATED_COLUMNS)
+    writer.writeheader()
+    try:
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    except Exception as e:
+        writer.writerow({'status': f'error: {e}'})
+    yield buffer.getvalue()
+
+
+def write_xlsx(rows, file):
+    """Write rows as a one-sheet annotated workbook to a binary file object"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Results')
+    sheet.append(ANNOTATED_COLUMNS)
+    for row in rows:
+        sheet.append([row.get(column, '') for column in ANNOTATED_COLUMNS])
+    workbook.save(file)
@@ -2,9 +2,12 @@
 # This file shows how to implement the replace functionality
 
 import os
+import time
+import hashlib
+import requests
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import Request, AuthorizedSession
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 import io
@@ -13,11 +16,20 @@ import pandas as pd
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# Drive REST endpoint used by resumable downloads
+DRIVE_API_BASE = 'https://www.googleapis.com/drive/v3'
+
+# Byte range requested per download request, and the pieces it is written to disk in
+DOWNLOAD_RANGE_SIZE = 8 * 1024 * 1024
+DOWNLOAD_WRITE_SIZE = 1024 * 1024
+
 class GoogleDriveManager:
     def __init__(self):
         self.creds = None
         self.service = None
         self.setup_credentials()
+        # Authorized requests session for resumable downloads
+        self.session = AuthorizedSession(self.creds)
     
     def setup_credentials(self):
         """Set up Google Drive API credentials"""
@@ -89,6 +101,79 @@ class GoogleDriveManager:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def download_file_resumable(self, file_id, local_path, max_retries=5):
+        """Download a file in byte ranges with constant memory, resuming after failures
+        
+        Chunks are appended to local_path + '.part'. After a failed request the
+        download continues from the last byte written, and a later call picks up
+        a .part file left by an earlier one. The size and MD5 checksum reported
+        by Drive are verified before the file is atomically renamed to local_path.
+        """
+        part_path = local_path + '.part'
+        file_url = f"{DRIVE_API_BASE}/files/{file_id}"
+        try:
+            response = self.session.get(file_url, params={'fields': 'name,size,md5Checksum'}, timeout=30)
+            response.raise_for_status()
+            info = response.json()
+            total_size = int(info['size'])
+            
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset > total_size:
+                # Left over from an older version of the file
+                os.remove(part_path)
+                offset = 0
+            if offset:
+                print(f"Resuming download at byte {offset} of {total_size}")
+            
+            failures = 0
+            with open(part_path, 'ab') as f:
+                while offset < total_size:
+                    end = min(offset + DOWNLOAD_RANGE_SIZE, total_size) - 1
+                    try:
+                        with self.session.get(file_url, params={'alt': 'media'}, stream=True, timeout=60,
+                                              headers={'Range': f'bytes={offset}-{end}'}) as response:
+                            if response.status_code == 200:
+                                # Range not supported: the whole file follows, start over
+                                f.seek(0)
+                                f.truncate()
+                                offset = 0
+                            elif response.status_code != 206:
+                                raise IOError(f"HTTP {response.status_code}")
+                            
+                            for chunk in response.iter_content(chunk_size=DOWNLOAD_WRITE_SIZE):
+                                f.write(chunk)
+                                offset += len(chunk)
+                        f.flush()
+                        failures = 0
+                        print(f"Download {int(offset * 100 / total_size)}%")
+                    
+                    except (requests.RequestException, IOError) as e:
+                        failures += 1
+                        if failures > max_retries:
+                            raise
+                        # Continue from the bytes that made it to disk
+                        f.flush()
+                        offset = os.path.getsize(part_path)
+                        print(f"Download interrupted at byte {offset} ({e}), retry {failures}/{max_retries}")
+                        time.sleep(min(2 ** failures, 30))
+            
+            if os.path.getsize(part_path) != total_size:
+                raise IOError(f"Size mismatch: got {os.path.getsize(part_path)} bytes, expected {total_size}")
+            
+            md5 = hashlib.md5()
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_WRITE_SIZE), b''):
+                    md5.update(chunk)
+            if info.get('md5Checksum') and md5.hexdigest() != info['md5Checksum']:
+                os.remove(part_path)
+                raise IOError(f"Checksum mismatch: got {md5.hexdigest()}, expected {info['md5Checksum']}")
+            
+            os.replace(part_path, local_path)
+            return {'success': True, 'path': local_path, 'size': total_size, 'md5Checksum': md5.hexdigest()}
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'resumable': os.path.exists(part_path)}
+    
     def get_file_info(self, file_id):
         """Get file information"""
         try:
@@ -112,8 +197,8 @@ def update_database_from_google_drive(database_key):
     # Initialize Google Drive manager
     drive_manager = GoogleDriveManager()
     
-    # Download current file
-    download_result = drive_manager.download_file(file_id, f'temp_{database_key}.csv')
+    # Download current file (resumes a previous partial download if there is one)
+    download_result = drive_manager.download_file_resumable(file_id, f'temp_{database_key}.csv')
     
     if download_result['success']:
         # Process the new file (validate, etc.)
@@ -0,0 +1,28 @@
+# Gunicorn settings (picked up automatically by `gunicorn app:app`)
+import gc
+import os
+
+try:
+    from config import SHARED_DATA_CONFIG
+except ImportError:
+    SHARED_DATA_CONFIG = {'enabled': False}
+
+# In shared data mode the master imports the app, loads the databases once and
+# publishes them as memory-mapped files before forking the workers
+preload_app = SHARED_DATA_CONFIG.get('enabled', False)
+
+# Request handlers only read the immutable dataset, so one worker serves requests
+# on several threads (GUNICORN_THREADS). Each worker process holds its own copy of
+# the databases unless they are shared, so WEB_CONCURRENCY only adds workers in
+# shared data mode. Workers added with -w outside shared data mode follow each
+# other's database updates (see follow_other_worker_reloads in app.py)
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2)) if preload_app else 1
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before workers are forked"""
+    if preload_app:
+        # Keep the garbage collector from touching (and copying) preloaded objects in workers
+        gc.freeze()
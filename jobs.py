@@ -0,0 +1,211 @@
+# Background screening jobs for very large CAS lists
+#
+# A job takes an uploaded file, resolves its CAS numbers in parallel batches on a
+# small local thread pool and writes an annotated CSV with one row per match (or a
+# "not found" row). Job state is kept on disk, one directory per job, so any
+# gunicorn worker can report progress and serve the result file:
+#
+#   <directory>/<job_id>/input       the uploaded file
+#   <directory>/<job_id>/status.json progress and outcome
+#   <directory>/<job_id>/results.csv annotated results (once completed)
+#
+# The helpers for reading CAS lists and annotating their results are shared with
+# the upload and export routes and with the command-line screener (screen.py).
+
+import os
+import re
+import csv
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import itertools
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Columns of annotated result files
+ANNOTATED_COLUMNS = ['inputCas', 'status', 'source', 'casNumber', 'chemicalName',
+                     'flag', 'flagDescription', 'activity']
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def annotated_rows(cas_numbers, results):
+    """Rows of an annotated result file for CAS numbers and their search results"""
+    for cas, cas_results in zip(cas_numbers, results):
+        if not cas_results:
+            yield {'inputCas': cas, 'status': 'not found'}
+            continue
+        for result in cas_results:
+            row = {'inputCas': cas, 'status': 'found'}
+            row.update(result)
+            yield row
+
+
+def screened_rows(values, cas_keys, results):
+    """Annotated rows for input values as given, with a row for each invalid one
+
+    cas_keys holds the lookup key of each value (None if it isn't a valid CAS
+    number) and results one result list per valid key, in order.
+    """
+    results = iter(results)
+    for value, key in zip(values, cas_keys):
+        if key is None:
+            yield {'inputCas': value, 'status': 'invalid'}
+        else:
+            yield from annotated_rows([value], [next(results)])
+
+
+def iter_input_values(text_stream, filename):
+    """Yield the non-blank values of a CAS list file: every cell after the header of a
+    CSV file, every line of any other file"""
+    if filename.lower().endswith('.csv'):
+        rows = csv.reader(text_stream)
+        values = (value for row in _skip_header(rows) for value in row)
+    else:
+        values = (line.strip() for line in text_stream)
+
+    for value in values:
+        if value:
+            yield value
+
+
+def _skip_header(rows):
+    """Rows of a CSV file after its first non-blank row"""
+    header_seen = False
+    for row in rows:
+        if not header_seen:
+            header_seen = any(value.strip() for value in row)
+            continue
+        yield row
+
+
+def iter_batches(values, size):
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(values)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class JobManager:
+    """Runs screening jobs in the background and tracks them on disk"""
+
+    def __init__(self, directory, extract, search, workers=2, batch_size=5000, retention_hours=24):
+        # extract(text_stream, filename) yields normalized CAS numbers,
+        # search(cas_numbers) returns one result list per CAS number
+        self.directory = directory
+        self.extract = extract
+        self.search = search
+        self.batch_size = batch_size
+        self.retention_hours = retention_hours
+        # One thread runs jobs one after another, the batch pool runs their lookups
+        self.job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job')
+        self.batch_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-batch')
+        self.status_lock = threading.Lock()
+
+    def job_dir(self, job_id):
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        return os.path.join(self.directory, job_id)
+
+    def submit(self, file, filename):
+        """Store an uploaded file as a new job and queue it, returns the job ID"""
+        self.prune()
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir)
+        file.save(os.path.join(job_dir, 'input'))
+
+        self._write_status(job_id, {
+            'jobId': job_id,
+            'filename': filename,
+            'status': 'queued',
+            'submittedAt': datetime.now().isoformat(),
+            'casTotal': None,
+            'casProcessed': 0,
+            'matches': 0
+        })
+        self.job_executor.submit(self._run, job_id, filename)
+        return job_id
+
+    def status(self, job_id):
+        """Current status dict of a job, None if it doesn't exist"""
+        job_dir = self.job_dir(job_id)
+        if job_dir is None:
+            return None
+        try:
+            with open(os.path.join(job_dir, 'status.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def result_path(self, job_id):
+        """Path of a completed job's result file, None if it isn't ready"""
+        status = self.status(job_id)
+        if status is None or status['status'] != 'completed':
+            return None
+        return os.path.join(self.job_dir(job_id), 'results.csv')
+
+    def prune(self):
+        """Remove finished jobs older than the retention period"""
+        if not os.path.isdir(self.directory):
+            return
+        cutoff = time.time() - self.retention_hours * 3600
+        for job_id in os.listdir(self.directory):
+            status = self.status(job_id)
+            if status is None or status['status'] not in ('completed', 'failed'):
+                continue
+            if os.path.getmtime(os.path.join(self.directory, job_id, 'status.json')) < cutoff:
+                shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+
+    def _write_status(self, job_id, status):
+        path = os.path.join(self.job_dir(job_id), 'status.json')
+        with self.status_lock:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(status, f)
+            os.replace(tmp_path, path)
+
+    def _run(self, job_id, filename):
+        job_dir = self.job_dir(job_id)
+        status = self.status(job_id)
+        status.update({'status': 'running', 'startedAt': datetime.now().isoformat()})
+        self._write_status(job_id, status)
+
+        try:
+            with open(os.path.join(job_dir, 'input'), encoding='utf-8', newline='') as f:
+                cas_numbers = list(self.extract(f, filename))
+            status['casTotal'] = len(cas_numbers)
+            self._write_status(job_id, status)
+
+            batches = [cas_numbers[start:start + self.batch_size]
+                       for start in range(0, len(cas_numbers), self.batch_size)]
+
+            partial_path = os.path.join(job_dir, 'results.csv.part')
+            with open(partial_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=ANNOTATED_COLUMNS)
+                writer.writeheader()
+
+                # Batches are searched in parallel and written in input order
+                for batch, results in zip(batches, self.batch_executor.map(self.search, batches)):
+                    for row in annotated_rows(batch, results):
+                        if row['status'] == 'found':
+                            status['matches'] += 1
+                        writer.writerow(row)
+                    status['casProcessed'] += len(batch)
+                    self._write_status(job_id, status)
+
+            os.replace(partial_path, os.path.join(job_dir, 'results.csv'))
+            status.update({'status': 'completed', 'finishedAt': datetime.now().isoformat()})
+
+        except Exception as e:
+            print(f"✗ Job {job_id} failed: {e}")
+            status.update({'status': 'failed', 'error': str(e), 'finishedAt': datetime.now().isoformat()})
+
+        self._write_status(job_id, status)
@@ -0,0 +1,118 @@
+# Prometheus metrics in the text exposition format (served at /metrics)
+#
+# A minimal, dependency-free implementation of counters, gauges and histograms
+# with labels. Values live in the process that records them, so with several
+# gunicorn workers each scrape sees the worker that answered it; give every
+# worker its own scrape target (or run one worker with many threads, see
+# gunicorn.conf.py) to get complete numbers.
+
+import threading
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow uploads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Size buckets in bytes, 1KB to 1GB
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+# Count buckets for CAS numbers per upload
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric with a value per combination of label values"""
+
+    type_name = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self):
+        """(name suffix, label values, extra labels, value) tuples to render"""
+        with self.lock:
+            return [('', key, (), value) for key, value in self.values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labels, key, extra)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            buckets, count, total = self.values.get(key, ([0] * len(self.buckets), 0, 0.0))
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    buckets[position] += 1
+            self.values[key] = (buckets, count + 1, total + value)
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, (buckets, count, total) in self.values.items():
+                # Bucket counts are cumulative: each observation counts in every bucket it fits
+                for bound, bucket_count in zip(self.buckets, buckets):
+                    samples.append(('_bucket', key, (('le', _format_value(float(bound))),), bucket_count))
+                samples.append(('_bucket', key, (('le', '+Inf'),), count))
+                samples.append(('_sum', key, (), total))
+                samples.append(('_count', key, (), count))
+        return samples
+
+
+def render():
+    """All registered metrics in the Prometheus text format"""
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
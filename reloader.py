@@ -0,0 +1,92 @@
+# Background database reloads
+#
+# A reload downloads and parses the databases and builds a new Dataset on a
+# background thread while requests keep being served from the current one. The
+# new dataset replaces the live one in a single reference assignment, so a search
+# sees either the old or the new version, never a mix.
+#
+# Reload state is kept in a small JSON file so every gunicorn worker can report it:
+#   <directory>/reload_status.json
+#
+# Outside shared data mode only the worker that ran the reload has the new data. The
+# other workers poll this file and, once a reload is completed, load the refreshed
+# snapshots themselves (see follow_other_worker_reloads in app.py).
+
+import os
+import json
+import tempfile
+import threading
+from datetime import datetime
+
+STATUS_FILE = 'reload_status.json'
+
+
+class Reloader:
+    """Runs one database reload at a time in the background"""
+
+    def __init__(self, directory, reload, stale_after_hours=1):
+        # reload(database_key) builds and swaps in a new dataset, returns the new
+        # version or raises. A 'running' status older than stale_after_hours is
+        # treated as left over from a process that died mid-reload.
+        self.directory = directory
+        self.reload = reload
+        self.stale_after_hours = stale_after_hours
+        self.lock = threading.Lock()
+        self.running = False
+
+    def status(self):
+        """Status dict of the current or last reload, None if there never was one"""
+        try:
+            with open(os.path.join(self.directory, STATUS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_running(self):
+        """Whether a reload is in progress in this or another worker"""
+        if self.running:
+            return True
+        status = self.status()
+        if status is None or status['status'] != 'running':
+            return False
+        age_hours = (datetime.now() - datetime.fromisoformat(status['startedAt'])).total_seconds() / 3600
+        return age_hours < self.stale_after_hours
+
+    def start(self, database_key):
+        """Start reloading in the background, returns False if a reload is already running"""
+        with self.lock:
+            if self.is_running():
+                return False
+            self.running = True
+            self._write_status({
+                'status': 'running',
+                'database': database_key,
+                'pid': os.getpid(),
+                'startedAt': datetime.now().isoformat()
+            })
+
+        thread = threading.Thread(target=self._run, args=(database_key,), name='reload', daemon=True)
+        thread.start()
+        return True
+
+    def _write_status(self, status):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, STATUS_FILE)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, path)
+
+    def _run(self, database_key):
+        status = self.status() or {'database': database_key}
+        try:
+            version = self.reload(database_key)
+            status.update({'status': 'completed', 'version': version})
+        except Exception as e:
+            print(f"✗ Reload of {database_key} failed: {e}")
+            status.update({'status': 'failed', 'error': str(e)})
+
+        status['finishedAt'] = datetime.now().isoformat()
+        with self.lock:
+            self._write_status(status)
+            self.running = False
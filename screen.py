@@ -0,0 +1,262 @@
+# Command-line bulk screener
+#
+# Screens CAS number lists of any size without the web app, e.g. for nightly
+# compliance runs:
+#
+#   python screen.py inventory.txt -o results.csv
+#   cat lists/*.txt | python screen.py --format ndjson > results.ndjson
+#   python screen.py suppliers.csv --data PMNACC_012025.csv --workers 8 -o results.csv
+#
+# Databases are read from local files only, nothing is downloaded: --data takes a CSV
+# file or a data_cache snapshot (.pkl) per database, recognized from the CSV header or
+# the snapshot name (or named, as in tscainv=inventory.csv). Without --data, the
+# LOCAL_FILES of config.py are used, or else the newest snapshot in data_cache.
+# --dataset uses a dataset published in shared data mode (data_cache/shared/<version>).
+#
+# Inputs are read like uploads (one CAS number per line, or every cell after the
+# header of a .csv file) and split into chunks, which a pool of worker processes
+# look up in parallel. Every input value gets its rows, in input order, with the
+# annotated columns of /api/export: 'found' (one row per match), 'not found' or
+# 'invalid'.
+#
+# The dataset is built once, saved as .npy files and memory-mapped by every worker
+# (as in shared data mode), so the workers read the same pages instead of each
+# holding a copy, and throughput grows with the number of cores.
+
+import io
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from collections import deque
+from multiprocessing import Pool
+
+import pandas as pd
+
+from config import LOCAL_FILES, SOURCES_CONFIG, SNAPSHOT_CONFIG
+from cas_codec import encode_cas
+from dataset import Dataset, build_dataset
+from jobs import ANNOTATED_COLUMNS, screened_rows, iter_input_values, iter_batches
+
+# Enabled databases by config key, and their columns by source name (as in app.py)
+SOURCES = {key: spec for key, spec in SOURCES_CONFIG.items() if spec.get('enabled', True)}
+SOURCE_COLUMNS = {spec['source']: spec for spec in SOURCES.values()}
+
+OUTPUT_FORMATS = ('csv', 'ndjson')
+
+DEFAULT_CHUNK_SIZE = 20000
+
+# Chunks queued per worker process: enough to keep every worker busy while the
+# input is read, without reading all of it into memory
+CHUNKS_PER_WORKER = 2
+
+# Dataset of a worker process, memory-mapped by init_worker
+worker_dataset = None
+
+
+def log(message):
+    """Progress messages go to stderr, stdout may be the results"""
+    print(message, file=sys.stderr)
+
+
+def source_key(path):
+    """Config key of the database in a data file, from its snapshot name or CSV header"""
+    file_name = os.path.basename(path)
+    if file_name.endswith('.pkl'):
+        # Snapshots are named <key>_<file_id>_<hash>.pkl (see snapshot_cache.py)
+        return next((key for key in SOURCES if file_name.startswith(f'{key}_')), None)
+
+    with open(path, encoding='utf-8', errors='replace') as f:
+        first_line = f.readline().lstrip('\ufeff')
+    return next((key for key, spec in SOURCES.items() if first_line.startswith(spec['header'])), None)
+
+
+def data_files(arguments):
+    """{config key: path} of the databases to load, from --data arguments or else the local defaults"""
+    files = {}
+    for argument in arguments or []:
+        name, separator, path = argument.partition('=')
+        key = name.lower() if separator and name.lower() in SOURCES else None
+        if key is None:
+            path = argument
+            key = source_key(path)
+            if key is None:
+                raise ValueError(f"Can't tell which database {path} holds, name it as in tscainv={path}")
+        files[key] = path
+    if arguments:
+        return files
+
+    for key in SOURCES:
+        local_path = LOCAL_FILES.get(key)
+        snapshots = glob.glob(os.path.join(SNAPSHOT_CONFIG['directory'], f'{key}_*.pkl'))
+        if local_path and os.path.exists(local_path):
+            files[key] = local_path
+        elif snapshots:
+            files[key] = max(snapshots, key=os.path.getmtime)
+    return files
+
+
+def load_dataset(files):
+    """Parse the data files and compile them into a Dataset, in result order"""
+    frames = []
+    for key, spec in SOURCES.items():
+        if key not in files:
+            continue
+        path = files[key]
+        data = pd.read_pickle(path) if path.endswith('.pkl') else pd.read_csv(path)
+        log(f"✓ Loaded {spec['source']} from {path}: {len(data)} records")
+        frames.append((spec['source'], data))
+
+    if not frames:
+        raise ValueError('No database files found, pass them with --data')
+    return build_dataset(frames, SOURCE_COLUMNS)
+
+
+def lookup_key(data, value):
+    """Integer lookup key of an input value, None if it can't be a valid CAS number
+
+    Same rule as app.parse_cas_key: a wrong check digit is only accepted within the
+    key range of a database without check digits (PMNACC).
+    """
+    key = encode_cas(value)
+    if key is None or not data.accepts_key(key):
+        return None
+    return key
+
+
+def init_worker(directory):
+    global worker_dataset
+    worker_dataset = Dataset.load(directory, mmap=True)
+
+
+def screen_chunk(values, output_format, data=None):
+    """Look up a chunk of input values, returns (rows formatted as output_format, counts)"""
+    if data is None:
+        data = worker_dataset
+    cas_keys = [lookup_key(data, value) for value in values]
+    results = data.records_many([key for key in cas_keys if key is not None])
+    found = sum(1 for cas_results in results if cas_results)
+    counts = {'inputs': len(values), 'found': found, 'notFound': len(results) - found,
+              'invalid': len(values) - len(results)}
+
+    buffer = io.StringIO()
+    rows = screened_rows(values, cas_keys, results)
+    if output_format == 'csv':
+        csv.writer(buffer).writerows([row.get(column, '') for column in ANNOTATED_COLUMNS] for row in rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(row) + '\n')
+    return buffer.getvalue(), counts
+
+
+def screened_chunks(chunks, output_format, workers, directory):
+    """(text, counts) of every chunk in input order, looked up on a pool of worker processes"""
+    with Pool(workers, initializer=init_worker, initargs=(directory,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(screen_chunk, (chunk, output_format)))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def iter_inputs(paths, stdin_csv=False):
+    """Input values of every file in turn, '-' reads stdin"""
+    for path in paths:
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace', newline='')
+            yield from iter_input_values(stream, 'stdin.csv' if stdin_csv else 'stdin')
+            continue
+        with open(path, encoding='utf-8', errors='replace', newline='') as f:
+            yield from iter_input_values(f, path)
+
+
+def screen(values, output, output_format, workers, chunk_size, data, directory=None):
+    """Write the annotated rows of all values to output, returns the counts"""
+    if output_format == 'csv':
+        csv.writer(output).writerow(ANNOTATED_COLUMNS)
+
+    chunks = iter_batches(values, chunk_size)
+    if workers > 1:
+        results = screened_chunks(chunks, output_format, workers, directory)
+    else:
+        results = (screen_chunk(chunk, output_format, data) for chunk in chunks)
+
+    totals = {'inputs': 0, 'found': 0, 'notFound': 0, 'invalid': 0}
+    for text, counts in results:
+        output.write(text)
+        for name, count in counts.items():
+            totals[name] += count
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Screen CAS numbers against the local databases')
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help="files of CAS numbers, one per line or as cells of a .csv file ('-' or none: stdin)")
+    parser.add_argument('--data', action='append', metavar='[NAME=]PATH',
+                        help='database CSV file or data_cache snapshot, once per database')
+    parser.add_argument('--dataset', metavar='DIR', help='dataset published in shared data mode')
+    parser.add_argument('-o', '--output', default='-', help="where to write the results ('-': stdout)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help='csv (the default) or ndjson (the default for .ndjson/.jsonl outputs)')
+    parser.add_argument('--csv-stdin', action='store_true', help='read stdin as a CSV file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes (default: cores)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='CAS numbers per work unit')
+    args = parser.parse_args(argv)
+
+    if args.data and args.dataset:
+        parser.error('use either --data or --dataset')
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error('--workers and --chunk-size must be at least 1')
+    output_format = args.format or ('ndjson' if args.output.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+    start = time.time()
+    directory = None
+    try:
+        if args.dataset:
+            data = Dataset.load(args.dataset, mmap=True)
+            directory = args.dataset
+            log(f"✓ Opened dataset {data.version} from {args.dataset}")
+        else:
+            data = load_dataset(data_files(args.data))
+            log(f"✓ Built dataset: {len(data.cas_index)} CAS keys in {time.time() - start:.2f}s")
+            if args.workers > 1:
+                # Saved once for the workers to memory-map, removed when done
+                directory = tempfile.mkdtemp(prefix='cas-screen-')
+                data.save(directory)
+    except (OSError, ValueError) as e:
+        log(f"✗ Failed to load the databases: {e}")
+        return 1
+
+    screen_start = time.time()
+    try:
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+        try:
+            totals = screen(iter_inputs(args.inputs, args.csv_stdin), output, output_format,
+                           args.workers, args.chunk_size, data, directory)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    except OSError as e:
+        log(f"✗ Screening failed: {e}")
+        return 1
+    finally:
+        if directory and not args.dataset:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    seconds = time.time() - screen_start
+    log(f"✓ Screened {totals['inputs']} CAS numbers in {seconds:.2f}s with {args.workers} worker(s): "
+        f"{totals['found']} found, {totals['notFound']} not found, {totals['invalid']} invalid "
+        f"({totals['inputs'] / seconds if seconds else 0:.0f}/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
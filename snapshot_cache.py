@@ -0,0 +1,184 @@
+# Local snapshot cache for downloaded databases
+# Parsed DataFrames are pickled to disk so that a restart can skip the
+# Google Drive download and the CSV parse entirely.
+#
+# Each source keeps a small JSON manifest next to its snapshot:
+#   <source>_<file_id>.json  ->  content hash, snapshot file name, creation time
+#   <source>_<file_id>_<hash>.pkl  ->  the parsed DataFrame
+#
+# A snapshot younger than max_age_hours is used without touching the network.
+# Older snapshots are revalidated with a conditional request (the manifest keeps
+# the ETag and Last-Modified headers of the download), so an unchanged file is
+# not transferred at all. If the server ignores those headers, a snapshot is
+# still reused when the downloaded file has the same content hash, which saves
+# the CSV parse.
+#
+# Several gunicorn workers (and loader threads) may refresh the same source at once.
+# snapshot_lock serializes them per source: each download goes to its own temporary
+# file, and whoever waited for the lock finds the snapshot its predecessor saved.
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): downloads are only serialized within a process
+    fcntl = None
+
+
+# Size of the pieces a download is written to disk in
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def download_to_file(response, path):
+    """Stream a requests response body to path in chunks, returns (SHA-256 hex digest, size)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    return digest.hexdigest(), size
+
+
+_thread_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def snapshot_lock(directory, source, file_id):
+    """Hold the lock for downloading, parsing and snapshotting one source, across processes"""
+    os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        with _thread_lock:
+            yield
+        return
+    # flock conflicts between separately opened files, so this also serializes threads
+    with open(os.path.join(directory, f"{source}_{file_id}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def response_validators(headers):
+    """ETag and Last-Modified of a download, to revalidate its snapshot later"""
+    return {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+
+def _manifest_path(directory, source, file_id):
+    return os.path.join(directory, f"{source}_{file_id}.json")
+
+
+def _read_manifest(directory, source, file_id):
+    try:
+        with open(_manifest_path(directory, source, file_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path, write):
+    """Write a file through a temporary file so readers never see partial content"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_snapshot(directory, manifest):
+    path = os.path.join(directory, manifest['snapshot'])
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+
+def load_snapshot(directory, source, file_id, max_age_hours):
+    """Return the cached DataFrame for a source if its snapshot is still fresh"""
+    manifest = _read_manifest(directory, source, file_id)
+    if manifest is None:
+        return None
+
+    age_hours = (datetime.now() - datetime.fromisoformat(manifest['verified_at'])).total_seconds() / 3600
+    if max_age_hours is not None and age_hours > max_age_hours:
+        print(f"Snapshot for {source} is stale ({age_hours:.1f}h old)")
+        return None
+
+    return _read_snapshot(directory, manifest)
+
+
+def conditional_headers(directory, source, file_id):
+    """Request headers that let the server answer 304 Not Modified if the snapshot is current"""
+    manifest = _read_manifest(directory, source, file_id)
+    if manifest is None or not os.path.exists(os.path.join(directory, manifest['snapshot'])):
+        return {}
+    headers = {}
+    if manifest.get('etag'):
+        headers['If-None-Match'] = manifest['etag']
+    if manifest.get('last_modified'):
+        headers['If-Modified-Since'] = manifest['last_modified']
+    return headers
+
+
+def find_snapshot(directory, source, file_id, file_hash=None, validators=None):
+    """Return the cached DataFrame if it was built from content with this hash
+
+    Without a hash the snapshot is returned as is, for a server that answered
+    304 Not Modified.
+    """
+    manifest = _read_manifest(directory, source, file_id)
+    if manifest is None or (file_hash is not None and manifest['content_hash'] != file_hash):
+        return None
+
+    data = _read_snapshot(directory, manifest)
+    if data is not None:
+        # Content is unchanged, so the snapshot counts as fresh again
+        manifest['verified_at'] = datetime.now().isoformat()
+        if validators:
+            manifest.update(validators)
+        _atomic_write(_manifest_path(directory, source, file_id),
+                      lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+    return data
+
+
+def save_snapshot(directory, source, file_id, file_hash, data, validators=None):
+    """Store a parsed DataFrame as the snapshot for this source and file content"""
+    os.makedirs(directory, exist_ok=True)
+
+    previous = _read_manifest(directory, source, file_id)
+    snapshot_name = f"{source}_{file_id}_{file_hash[:16]}.pkl"
+    _atomic_write(os.path.join(directory, snapshot_name),
+                  lambda f: data.to_pickle(f))
+
+    now = datetime.now().isoformat()
+    manifest = {
+        'source': source,
+        'file_id': file_id,
+        'content_hash': file_hash,
+        'snapshot': snapshot_name,
+        'records': int(len(data)),
+        'created_at': now,
+        'verified_at': now
+    }
+    manifest.update(validators or {})
+    _atomic_write(_manifest_path(directory, source, file_id),
+                  lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
+
+    # Drop the snapshot of the previous file content
+    if previous and previous['snapshot'] != snapshot_name:
+        old_path = os.path.join(directory, previous['snapshot'])
+        if os.path.exists(old_path):
+            os.remove(old_path)
@@ -0,0 +1,96 @@
+# Background warm-up at startup
+#
+# Loading the databases (download, CSV parse, index build) can take longer than a
+# gunicorn worker is allowed to boot. Instead the worker starts serving at once and
+# loads the data on a background thread; until it is ready, routes that need the data
+# answer 503 (see require_dataset in app.py) and /api/health reports the progress.
+# A failed load is retried every retry_seconds.
+
+import time
+import threading
+from datetime import datetime
+
+
+class Warmup:
+    """Loads the data once on a background thread, retrying until it succeeds"""
+
+    def __init__(self, load, retry_seconds=30):
+        # load(progress=callback) returns True once the data is ready. It reports
+        # progress as callback(stage) and callback(state, source) for each database.
+        self.load = load
+        self.retry_seconds = retry_seconds
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.state = 'pending'
+        self.stage = None
+        self.sources = {}
+        self.attempts = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        """Start loading in the background"""
+        self.started_at = datetime.now()
+        thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+        thread.start()
+
+    def run_once(self):
+        """Load in the calling thread (one attempt), returns whether the data is ready"""
+        self.started_at = datetime.now()
+        return self._attempt()
+
+    def wait(self, timeout=None):
+        """Block until the data is ready, returns False on timeout"""
+        return self.ready.wait(timeout)
+
+    def is_ready(self):
+        return self.ready.is_set()
+
+    def progress(self, stage, source=None):
+        with self.lock:
+            if source is None:
+                self.stage = stage
+            else:
+                self.sources[source] = stage
+
+    def status(self):
+        """Warm-up state for /api/health"""
+        with self.lock:
+            finished = self.finished_at or datetime.now()
+            return {
+                'state': self.state,
+                'stage': self.stage,
+                'sources': dict(self.sources),
+                'attempts': self.attempts,
+                'startedAt': self.started_at.isoformat() if self.started_at else None,
+                'elapsedSeconds': round((finished - self.started_at).total_seconds(), 2) if self.started_at else None
+            }
+
+    def _attempt(self):
+        with self.lock:
+            self.state = 'loading'
+            self.stage = None
+            self.sources = {}
+            self.attempts += 1
+        try:
+            loaded = self.load(progress=self.progress)
+        except Exception as e:
+            print(f"✗ Warm-up failed: {e}")
+            loaded = False
+
+        with self.lock:
+            if loaded:
+                self.state = 'ready'
+                self.finished_at = datetime.now()
+            else:
+                self.state = 'failed'
+        if loaded:
+            self.ready.set()
+        return loaded
+
+    def _run(self):
+        while not self._attempt():
+            print(f"✗ Data not loaded, retrying in {self.retry_seconds}s")
+            with self.lock:
+                self.state = 'retrying'
+            time.sleep(self.retry_seconds)